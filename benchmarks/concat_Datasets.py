@@ -0,0 +1,57 @@
+"""Time ``ekpy.analysis.concat_Datasets`` for many small Datasets.
+
+Each Dataset stands for one (per-day) data directory: its own path and a few rows of meta data with the same columns. Nothing is written to disk. Run from the repository root:
+
+	python benchmarks/concat_Datasets.py [--datasets 1000 10000] [--rows 20] [--repeat 3]
+
+"""
+import time
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from ekpy.analysis import Dataset, concat_Datasets
+
+
+def make_datasets(ndatasets, nrows):
+	"""Return ndatasets Datasets of nrows rows each, every one with its own path."""
+	rng = np.random.default_rng(0)
+	datasets = []
+	for i in range(ndatasets):
+		meta_data = pd.DataFrame({
+			'high_voltage_v':rng.choice([0.5, 1.0, 1.5], nrows),
+			'identifier':'day{}'.format(i),
+			'trial':np.arange(nrows),
+			'filename':['scope_{}.csv'.format(j) for j in range(nrows)],
+		})
+		datasets.append(Dataset('./data/day{}/'.format(i), meta_data))
+	return datasets
+
+def time_concat(datasets, repeat, **kwargs):
+	"""Best time (s) of ``concat_Datasets`` over repeat runs."""
+	best = np.inf
+	for i in range(repeat):
+		start = time.perf_counter()
+		concat_Datasets(datasets, **kwargs)
+		best = min(best, time.perf_counter() - start)
+	return best
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--datasets', type=int, nargs='+', default=[1000, 10000], help='number of Datasets to concatenate')
+	parser.add_argument('--rows', type=int, default=20, help='rows per Dataset')
+	parser.add_argument('--repeat', type=int, default=3, help='repeats per case (best is reported)')
+	args = parser.parse_args()
+
+	print('{:>10}{:>12}{:>16}'.format('datasets', 'concat', 'union_columns'))
+	for ndatasets in args.datasets:
+		with warnings.catch_warnings():
+			warnings.simplefilter('ignore')
+			datasets = make_datasets(ndatasets, args.rows)
+		times = [time_concat(datasets, args.repeat), time_concat(datasets, args.repeat, union_columns=True)]
+		print('{:>10}'.format(ndatasets) + '{:>11.3f}s'.format(times[0]) + '{:>15.3f}s'.format(times[1]))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,75 @@
+"""Compare the csv backends of ``ekpy.utils.read_ekpy_data``.
+
+Reads the example data (examples/example_data) and a generated Dataset with the same layout (meta_data.csv plus ekpy data files with a heading) but larger, scope-like files. Run from the repository root:
+
+	python benchmarks/csv_backends.py [--files 100] [--rows 10000] [--repeat 3]
+
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import functools
+
+import numpy as np
+import pandas as pd
+
+from ekpy import analysis
+from ekpy.utils import read_ekpy_data, write_ekpy_data, available_csv_backends
+
+EXAMPLE_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples', 'example_data')
+
+
+def make_dataset(path, nfiles, nrows):
+	"""Write nfiles ekpy data files (columns time, p1, p2 and three diagnostics) and their meta_data.csv to path."""
+	rng = np.random.default_rng(0)
+	meta_data = []
+	for i in range(nfiles):
+		data = pd.DataFrame({column:rng.standard_normal(nrows) for column in ('time', 'p1', 'p2', 'd1', 'd2', 'd3')})
+		md = {'high_voltage_v':i%10, 'trial':i//10, 'filename':'scope_{}.csv'.format(i)}
+		write_ekpy_data(os.path.join(path, md['filename']), data, md)
+		meta_data.append(md)
+	pd.DataFrame(meta_data).to_csv(os.path.join(path, 'meta_data.csv'), index=False)
+
+def time_get_data(path, backend, repeat, **kwargs):
+	"""Best time (s) of ``Dataset.get_data`` with backend, over repeat runs."""
+	readfileby = functools.partial(read_ekpy_data, backend=backend)
+	best = np.inf
+	for i in range(repeat):
+		dset = analysis.load_Dataset(path, readfileby=readfileby)
+		start = time.perf_counter()
+		dset.get_data(**kwargs)
+		best = min(best, time.perf_counter() - start)
+	return best
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--files', type=int, default=100, help='number of generated files')
+	parser.add_argument('--rows', type=int, default=10000, help='rows per generated file')
+	parser.add_argument('--repeat', type=int, default=3, help='repeats per case (best is reported)')
+	args = parser.parse_args()
+
+	# the in memory cache would hide the parsing
+	analysis.memory_cache.max_bytes = 0
+
+	generated = tempfile.mkdtemp()
+	try:
+		make_dataset(generated, args.files, args.rows)
+		cases = [
+			('dataset1', os.path.join(EXAMPLE_DATA, 'dataset1'), {}),
+			('dataset2', os.path.join(EXAMPLE_DATA, 'dataset2'), {}),
+			('generated', generated, {}),
+			('generated, 2 columns', generated, {'columns':['time', 'p1']}),
+			('generated, float32', generated, {'dtype':'float32'}),
+		]
+		backends = available_csv_backends()
+		print('{:<24}'.format('case') + ''.join('{:>12}'.format(backend) for backend in backends))
+		for name, path, kwargs in cases:
+			times = [time_get_data(path, backend, args.repeat, **kwargs) for backend in backends]
+			print('{:<24}'.format(name) + ''.join('{:>11.3f}s'.format(t) for t in times))
+	finally:
+		shutil.rmtree(generated)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,58 @@
+"""Time how ``Dataset.get_data`` assembles the files of a group into one data dict, for groups of many trials.
+
+Each trial stands for one file read by readfileby: a ``pandas.DataFrame`` with a few columns of --samples rows. Ragged groups have trials of different lengths (padded with nans). The repeated ``numpy.vstack`` the groups were built with before is timed for comparison, up to --vstack-max trials (it is quadratic in trials). Nothing is written to disk. Run from the repository root:
+
+	python benchmarks/stack_arrays.py [--trials 1000 2500 5000 10000] [--samples 500] [--repeat 3]
+
+"""
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from ekpy.analysis.core import _build_data_dict
+
+
+def make_trials(ntrials, nsamples, ragged=False):
+	"""Return ntrials DataFrames (columns time, p1, p2) of nsamples rows each, or between nsamples/2 and nsamples rows if ragged."""
+	rng = np.random.default_rng(0)
+	lengths = rng.integers(nsamples//2, nsamples + 1, ntrials) if ragged else np.full(ntrials, nsamples)
+	return [pd.DataFrame({column:rng.standard_normal(length) for column in ('time', 'p1', 'p2')}) for length in lengths]
+
+def repeated_vstack(tdfs):
+	"""Data dict of tdfs built by vstacking one trial at a time, as get_data did before."""
+	out = {}
+	for tdf in tdfs:
+		for column in tdf.columns:
+			values = tdf[column].values
+			out[column] = values if column not in out else np.vstack((out[column], values))
+	return out
+
+def best_time(func, tdfs, repeat):
+	"""Best time (s) of func(tdfs) over repeat runs."""
+	best = np.inf
+	for i in range(repeat):
+		start = time.perf_counter()
+		func(tdfs)
+		best = min(best, time.perf_counter() - start)
+	return best
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+	parser.add_argument('--trials', type=int, nargs='+', default=[1000, 2500, 5000, 10000], help='trials per group')
+	parser.add_argument('--samples', type=int, default=500, help='samples per trial')
+	parser.add_argument('--repeat', type=int, default=3, help='repeats per case (best is reported)')
+	parser.add_argument('--vstack-max', type=int, default=2500, help='largest group timed with the repeated vstack')
+	args = parser.parse_args()
+
+	print('{:>10}{:>12}{:>14}{:>12}{:>18}'.format('trials', 'stack', 'us/trial', 'ragged', 'repeated vstack'))
+	for ntrials in args.trials:
+		tdfs = make_trials(ntrials, args.samples)
+		stack = best_time(_build_data_dict, tdfs, args.repeat)
+		ragged = best_time(_build_data_dict, make_trials(ntrials, args.samples, ragged=True), args.repeat)
+		vstack = '{:>17.3f}s'.format(best_time(repeated_vstack, tdfs, 1)) if ntrials <= args.vstack_max else '{:>18}'.format('-')
+		print('{:>10}'.format(ntrials) + '{:>11.3f}s'.format(stack) + '{:>14.1f}'.format(stack/ntrials*1e6) + '{:>11.3f}s'.format(ragged) + vstack)
+
+if __name__ == '__main__':
+	main()
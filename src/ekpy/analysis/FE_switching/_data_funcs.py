@@ -7,6 +7,7 @@ from scipy import signal
 from ..data_funcs import _fod_dimensionality_fixer
 from ..data_funcs import iterable_data_array
 from ..data_funcs import data_array_builder
+from ..data_funcs import batch_capable
 
 __all__ = (
 	'get_dps',
@@ -147,6 +148,7 @@ def reset_time(data_dict, key = 'p1', cutoff = 0.01, grace = 10):
 
     return {key: out[key].build() for key in out}
 
+@batch_capable
 def get_dps(data_dict, R = 50):
     """Calculate the difference between data keys 'p1' and 'p2'
 
@@ -166,6 +168,7 @@ def get_dps(data_dict, R = 50):
     return {'time':data_dict['time'], 'dp':worker.build()}
 
 
+@batch_capable
 def smooth(data_dict, key='dp', N=3, Wn=0.05):
     """
     Apply butterworth filter (scipy.signal.butter) to specified key of data.
@@ -196,6 +199,7 @@ def smooth(data_dict, key='dp', N=3, Wn=0.05):
     out.update({key:for_out.build()})
     return out
 
+@batch_capable
 def subtract_median_of_lastN(data_dict, key='dp', N=20):
     """
     Subtract the median of the last N samples. This may be used to account for constant offsets in the noise floor, for example.
@@ -216,18 +220,13 @@ def subtract_median_of_lastN(data_dict, key='dp', N=20):
     #it is crucial that you include the , on LHS in next line because _fod... returns a tuple
     to_subtract,  = _fod_dimensionality_fixer(data_dict, check_key = key, keys_to_fix = [key])
     to_subtract = np.nan_to_num(to_subtract, 0)
-        
-    ndims = to_subtract.shape[0]
+
     out = data_dict.copy()
-    
-    for d in range(ndims):
-        X = to_subtract[d, :]
-        median = np.median(X[-N:]).flatten()[0]
-        sig = X - median
-        try:
-            for_out = np.vstack((for_out, sig))
-        except NameError:
-            for_out = sig.copy()
+
+    # the median of each row in one call, rows are not stacked one at a time
+    for_out = to_subtract - np.median(to_subtract[:, -N:], axis=1, keepdims=True)
+    if for_out.shape[0] == 1:
+        for_out = for_out[0]
     out.update({key:for_out})
     return out
 
@@ -286,6 +285,7 @@ def get_saturation_and_switching_time(data_dict, key = 'int', n_points_for_satur
     return out
 
 
+@batch_capable
 def invert(data_dict, keys = 'all'):
     """
     Invert data. If keys set to 'all', all keys will be inverted except 'time'.
@@ -319,6 +319,7 @@ def invert(data_dict, keys = 'all'):
     return out 
 
 
+@batch_capable
 def integrate(data_dict, key = 'dp'):
     """
     Integrate dps.
@@ -351,6 +352,7 @@ def integrate(data_dict, key = 'dp'):
     return {key: out[key].build() for key in out}
 
 
+@batch_capable
 def get_pol_trans_from_dps(data_dict, area='from diameter', diameter=None, time_unit = 'ns', **kwargs):
     """
     Get polarization transient. Data must contain keys 'time' and 'dp'. Area is supplied in um^2
@@ -1,5 +1,6 @@
 from .core import *
 from .load import *
+from .cache import *
 from .utils import *
 from .data_utils import *
 from .data_funcs import *
\ No newline at end of file
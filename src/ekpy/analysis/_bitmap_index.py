@@ -0,0 +1,126 @@
+import ast
+
+import numpy as np
+import pandas as pd
+
+
+class _bitmap_index():
+	"""Bitmap (inverted) index of a single column of meta data. Rows are factorized into codes (position of the value of the row in uniques, -1 for nan) and every unique value has a packed bitset of the rows holding it. Bitsets are built the first time they are needed, so taking rows (for derived Datasets) only takes codes.
+
+	args:
+		codes (numpy.ndarray): Code of each row
+		uniques (pandas.Index): Unique values
+
+	"""
+
+	def __init__(self, codes, uniques):
+		self.codes = codes
+		self.uniques = uniques
+		self._bitsets = None
+
+	@classmethod
+	def from_values(cls, values):
+		codes, uniques = pd.factorize(values)
+		return cls(codes, pd.Index(uniques))
+
+	def __len__(self):
+		return len(self.codes)
+
+	@property
+	def bitsets(self):
+		"""Packed bitset of each unique value, the last row holds the rows with nan. Shape (len(uniques) + 1, ceil(len(self)/8))."""
+		if self._bitsets is None:
+			codes = np.where(self.codes < 0, len(self.uniques), self.codes)
+			self._bitsets = np.packbits(codes[np.newaxis, :] == np.arange(len(self.uniques) + 1)[:, np.newaxis], axis = 1)
+		return self._bitsets
+
+	def take(self, positions):
+		"""Return the index of the rows at positions."""
+		return _bitmap_index(self.codes[positions], self.uniques)
+
+	def isin(self, values):
+		"""Return the packed bitset of rows whose value is in values (array-like). None if values cannot be looked up in the index (bool values for a non bool column, which pandas compares as numbers)."""
+		values = list(values)
+		if self.uniques.dtype.kind != 'b' and any(isinstance(value, (bool, np.bool_)) for value in values):
+			return None
+		positions = self.uniques.get_indexer(pd.Index(values, dtype = object))
+		return self._union(positions[positions >= 0])
+
+	def where(self, function, **kwargs):
+		"""Return the packed bitset of rows for which function(value) is True, evaluating function once per unique value. None if the column has missing values (which the index does not tell apart) or function does not return a bool for every value."""
+		if (self.codes < 0).any():
+			return None
+		# only values present in the rows
+		present = np.flatnonzero(np.bincount(self.codes, minlength = len(self.uniques)))
+		values = self.uniques.to_numpy(dtype = object)
+		results = [function(value, **kwargs) for value in values[present]]
+		if not all(isinstance(result, (bool, np.bool_)) for result in results):
+			return None
+		return self._union(present[np.array(results, dtype = bool)])
+
+	def _union(self, rows):
+		if len(rows) == 0:
+			return np.zeros(self.bitsets.shape[1], dtype = np.uint8)
+		return np.bitwise_or.reduce(self.bitsets[rows], axis = 0)
+
+
+def _to_positions(bits, n):
+	"""Positions of the set bits of packed bitset bits of n rows."""
+	return np.flatnonzero(np.unpackbits(bits, count = n))
+
+def _query_bits(expr, indices):
+	"""Evaluate query expr with the bitmap indices of the meta data, if possible.
+
+	Supported are comparisons of an indexed column with a literal (``==``, ``!=``, ``in``, ``not in``) combined with ``and``/``or`` (or ``&``/``|`` between parenthesized comparisons).
+
+	args:
+		expr (str): Query string as for ``pandas.DataFrame.query``
+		indices (dict): column -> _bitmap_index
+
+	returns:
+		(numpy.ndarray or None): Packed bitset of the rows satisfying expr. None if expr cannot be answered by indices.
+	"""
+	try:
+		tree = ast.parse(expr.strip(), mode = 'eval')
+	except SyntaxError:
+		return None
+	return _eval_bits(tree.body, indices)
+
+def _eval_bits(node, indices):
+	if isinstance(node, ast.BoolOp):
+		combine = np.bitwise_and if isinstance(node.op, ast.And) else np.bitwise_or
+		return _combine([_eval_bits(value, indices) for value in node.values], combine)
+
+	if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+		combine = np.bitwise_and if isinstance(node.op, ast.BitAnd) else np.bitwise_or
+		return _combine([_eval_bits(node.left, indices), _eval_bits(node.right, indices)], combine)
+
+	if not isinstance(node, ast.Compare) or len(node.ops) != 1:
+		return None
+
+	op, left, right = node.ops[0], node.left, node.comparators[0]
+	if isinstance(op, (ast.Eq, ast.NotEq)) and isinstance(right, ast.Name) and not isinstance(left, ast.Name):
+		left, right = right, left
+	if not isinstance(left, ast.Name) or left.id not in indices:
+		return None
+	try:
+		value = ast.literal_eval(right)
+	except (ValueError, TypeError, SyntaxError):
+		return None
+
+	if isinstance(op, (ast.Eq, ast.NotEq)):
+		values = [value]
+	elif isinstance(op, (ast.In, ast.NotIn)) and isinstance(value, (list, tuple, set)):
+		values = value
+	else:
+		return None
+
+	bits = indices[left.id].isin(values)
+	if bits is not None and isinstance(op, (ast.NotEq, ast.NotIn)):
+		bits = np.invert(bits)
+	return bits
+
+def _combine(bits, combine):
+	if any(b is None for b in bits):
+		return None
+	return combine.reduce(bits)
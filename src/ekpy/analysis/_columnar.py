@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+# Column storage of the entries of a Data, used by ekpy.analysis.core.ColumnarData:
+#	definitions: the definition dict of each row as given. For each definition key, built the first time it is needed, the (row, value code) pairs of the values in the definition sets of the rows, value codes index the unique values of the key
+#	data: for each data key, the flattened arrays of all rows concatenated in one buffer, with the offset and shape of the array of each row. If the arrays of a key are not numeric arrays of a single dtype they are kept in an object array instead
+
+
+class _definition_column():
+	"""The values of one definition key of all rows, as (row, value code) pairs.
+
+	args:
+		rows (numpy.ndarray): Row of each value
+		values (list): Values (elements of the definition sets)
+		nrows (int): Number of rows
+		has_key (numpy.ndarray): Whether the definition of each row has the key
+
+	"""
+
+	def __init__(self, rows, values, nrows, has_key):
+		objects = np.empty(len(values), dtype = object)
+		objects[:] = values
+		codes, uniques = pd.factorize(objects)
+		uniques = np.asarray(uniques, dtype = object)
+
+		# missing values (None, nan, ...) are kept apart by type, nan is never equal to a value but None is
+		missing = np.flatnonzero(codes < 0)
+		if len(missing) != 0:
+			kinds, extra = {}, []
+			for i in missing:
+				kind = type(objects[i])
+				if kind not in kinds:
+					kinds[kind] = len(uniques) + len(extra)
+					extra.append(objects[i])
+				codes[i] = kinds[kind]
+			tmp = np.empty(len(extra), dtype = object)
+			tmp[:] = extra
+			uniques = np.concatenate((uniques, tmp))
+
+		self.rows = np.asarray(rows, dtype = np.int64)
+		self.codes = codes.astype(np.int64)
+		self.values = uniques
+		self.nrows = nrows
+		self.has_key = has_key
+		self._index = None
+
+	def codes_of(self, values):
+		"""Codes of the values equal to any of values. NaN is equal to nothing (as with ``numpy.ndarray.__eq__``)."""
+		if self._index is None:
+			self._index = pd.Index(self.values, dtype = object)
+		codes = []
+		for value in values:
+			if value is None:
+				codes.extend(i for i, x in enumerate(self.values) if x is None)
+				continue
+			try:
+				if pd.isna(value):
+					continue
+			except (TypeError, ValueError):
+				pass
+			try:
+				code = self._index.get_indexer([value])[0]
+			except TypeError: # unhashable
+				continue
+			if code >= 0 and self.values[code] is not None:
+				codes.append(code)
+		return np.array(codes, dtype = np.int64)
+
+	def rows_with(self, codes):
+		"""Boolean array, whether each row has a value with one of codes."""
+		out = np.zeros(self.nrows, dtype = bool)
+		out[self.rows[np.isin(self.codes, codes)]] = True
+		return out
+
+	def counts(self):
+		"""Number of values of each row."""
+		return np.bincount(self.rows, minlength = self.nrows)
+
+	def first_codes(self):
+		"""Code of the first value of each row (-1 if none)."""
+		out = np.full(self.nrows, -1, dtype = np.int64)
+		out[self.rows[::-1]] = self.codes[::-1]
+		return out
+
+	def present_values(self, rows):
+		"""Unique values of rows (numpy.ndarray of positions)."""
+		selected = np.zeros(self.nrows, dtype = bool)
+		selected[rows] = True
+		return self.values[np.unique(self.codes[selected[self.rows]])]
+
+
+class _data_column():
+	"""The arrays of one data key of all rows.
+
+	args:
+		arrays (list): Array of each row, None if the row does not have the key
+
+	"""
+
+	def __init__(self, arrays):
+		self.nrows = len(arrays)
+		self.present = np.array([array is not None for array in arrays], dtype = bool)
+		present = [array for array in arrays if array is not None]
+		dtypes = {array.dtype for array in present if isinstance(array, np.ndarray)}
+		self.is_buffer = (
+			all(isinstance(array, np.ndarray) for array in present) and len(dtypes) <= 1 and
+			not any(dtype.hasobject for dtype in dtypes)
+		)
+		if not self.is_buffer:
+			self.values = np.empty(self.nrows, dtype = object)
+			self.values[:] = arrays
+			return
+
+		dtype = dtypes.pop() if len(dtypes) != 0 else np.dtype(float)
+		sizes = np.array([0 if array is None else array.size for array in arrays], dtype = np.int64)
+		self.offsets = np.zeros(self.nrows + 1, dtype = np.int64)
+		np.cumsum(sizes, out = self.offsets[1:])
+		self.buffer = np.empty(self.offsets[-1], dtype = dtype)
+		self.shapes = np.empty(self.nrows, dtype = object)
+		for row, array in enumerate(arrays):
+			if array is not None:
+				self.buffer[self.offsets[row]:self.offsets[row + 1]] = array.reshape(-1)
+				self.shapes[row] = array.shape
+
+	def get(self, row):
+		"""Array of row (a view of the buffer), None if the row does not have the key."""
+		if not self.present[row]:
+			return None
+		if not self.is_buffer:
+			return self.values[row]
+		return self.buffer[self.offsets[row]:self.offsets[row + 1]].reshape(self.shapes[row])
+
+	def gather(self, rows):
+		"""Flattened arrays of rows (numpy.ndarray of positions) concatenated."""
+		if not self.is_buffer:
+			return np.concatenate([np.asarray(self.values[row]).flatten() for row in rows])
+		starts = self.offsets[rows]
+		lengths = self.offsets[rows + 1] - starts
+		if len(rows) == self.nrows and (np.diff(rows) == 1).all():
+			return self.buffer.copy()
+		index = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+		return self.buffer[index]
+
+
+class _columnar_store():
+	"""Definitions and data of the entries of a Data by column, see the layout above. Rows are the entries in the given order.
+
+	args:
+		entries (list): Entries ({'definition':dict, 'data':dict}) of a Data
+
+	"""
+
+	def __init__(self, entries):
+		for entry in entries:
+			if not isinstance(entry, dict) or 'definition' not in entry or 'data' not in entry:
+				raise ValueError("entries must be dicts with keys 'definition' and 'data'. Received {}".format(entry))
+
+		self.nrows = len(entries)
+		self.definitions = np.empty(self.nrows, dtype = object)
+		self.definitions[:] = [entry['definition'] for entry in entries]
+		self._definition_columns = {}
+
+		data_keys = list(dict.fromkeys(key for entry in entries for key in entry['data']))
+		datas = [entry['data'] for entry in entries]
+		self.data_columns = {key:_data_column([data.get(key) for data in datas]) for key in data_keys}
+		self.data_keys = np.empty(self.nrows, dtype = object)
+		self.data_keys[:] = [tuple(data) for data in datas]
+
+	def definition_keys(self, rows):
+		"""Definition keys of rows, in order of first appearance."""
+		return list(dict.fromkeys(key for definition in self.definitions[rows] for key in definition))
+
+	def definition_column(self, key):
+		"""_definition_column of key, raises KeyError if no row has key."""
+		if key not in self._definition_columns:
+			rows, values = [], []
+			has_key = np.zeros(self.nrows, dtype = bool)
+			for row, definition in enumerate(self.definitions):
+				if key not in definition:
+					continue
+				has_key[row] = True
+				_values = list(definition[key])
+				rows.extend([row]*len(_values))
+				values.extend(_values)
+			if not has_key.any():
+				raise KeyError(key)
+			self._definition_columns[key] = _definition_column(rows, values, self.nrows, has_key)
+		return self._definition_columns[key]
+
+	def data(self, row):
+		"""Data dict of row, arrays are views of the buffers."""
+		return {key:self.data_columns[key].get(row) for key in self.data_keys[row]}
+
+	def entry(self, row):
+		"""Entry ({'definition':dict, 'data':dict}) of row."""
+		return {'definition':self.definitions[row], 'data':self.data(row)}
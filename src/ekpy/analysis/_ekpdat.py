@@ -0,0 +1,175 @@
+import pickle
+import struct
+from collections.abc import Mapping, MutableMapping
+from pprint import pformat
+
+import numpy as np
+
+# .ekpdat (Data) file layout, version 2:
+#	prefix: magic (8 bytes), version (uint16), reserved (uint16), offset and size of the index (uint64)
+#	chunks: one per Data index. The arrays of its data, each starting at a multiple of _EKPDAT_ALIGN from the start of the file, or the whole entry pickled if its data are not all numeric arrays
+#	index: pickled list with, for each Data index, (index, definition, chunk). chunk is ('arrays', [(data key, offset, dtype, shape)]) or ('pickle', offset, size)
+# The index is written last, so arrays are written as they are without knowing the size of the index in advance.
+# Files written before version 2 are a pickled dict.
+_EKPDAT_MAGIC = b'\x93EKPYDAT'
+_EKPDAT_VERSION = 2
+_EKPDAT_ALIGN = 64
+_EKPDAT_PREFIX = struct.Struct('<8sHHQQ')
+
+
+def _is_array_entry(entry):
+	"""Whether entry (of a Data dict) is stored as arrays: a dict with definition and data, data holding only numpy arrays without objects."""
+	return (
+		isinstance(entry, Mapping) and set(entry) == {'definition', 'data'} and isinstance(entry['data'], Mapping) and
+		all(isinstance(values, np.ndarray) and not values.dtype.hasobject for values in entry['data'].values())
+	)
+
+def _write_ekpdat(filename, data_dict):
+	"""Write the dict of a Data to .ekpdat file (version 2).
+
+	args:
+		filename (str): File name
+		data_dict (dict): ``Data._dict``
+
+	"""
+	index = []
+	with open(filename, 'wb') as f:
+		f.write(_EKPDAT_PREFIX.pack(_EKPDAT_MAGIC, _EKPDAT_VERSION, 0, 0, 0))
+		for key, entry in data_dict.items():
+			if not _is_array_entry(entry):
+				pickled = pickle.dumps(entry, protocol = pickle.HIGHEST_PROTOCOL)
+				index.append((key, None, ('pickle', f.tell(), len(pickled))))
+				f.write(pickled)
+				continue
+
+			arrays = []
+			for data_key, values in entry['data'].items():
+				values = np.ascontiguousarray(values)
+				offset = -(-f.tell()//_EKPDAT_ALIGN)*_EKPDAT_ALIGN
+				f.write(b'\x00'*(offset - f.tell()))
+				f.write(values.reshape(-1).view(np.uint8).data)
+				arrays.append((data_key, offset, values.dtype.str, values.shape))
+			index.append((key, entry['definition'], ('arrays', arrays)))
+
+		index_offset = f.tell()
+		pickled = pickle.dumps(index, protocol = pickle.HIGHEST_PROTOCOL)
+		f.write(pickled)
+		f.seek(0)
+		f.write(_EKPDAT_PREFIX.pack(_EKPDAT_MAGIC, _EKPDAT_VERSION, 0, index_offset, len(pickled)))
+
+def _is_ekpdat_v2(f):
+	"""Whether f (opened in binary mode) is a .ekpdat file of version 2 or later. Does not move f."""
+	position = f.tell()
+	magic = f.read(len(_EKPDAT_MAGIC))
+	f.seek(position)
+	return magic == _EKPDAT_MAGIC
+
+def _read_ekpdat_index(f):
+	"""Return the index of .ekpdat file (version 2 or later) f, see the layout above."""
+	magic, version, _, index_offset, index_size = _EKPDAT_PREFIX.unpack(f.read(_EKPDAT_PREFIX.size))
+	if version > _EKPDAT_VERSION:
+		raise ValueError('{} is .ekpdat version {}, this version of ekpy reads up to version {}. Please upgrade ekpy.'.format(getattr(f, 'name', f), version, _EKPDAT_VERSION))
+	f.seek(index_offset)
+	return pickle.loads(f.read(index_size))
+
+def _read_ekpdat(filename, indices=None, mmap_mode=None, lazy=False):
+	"""Read the dict of a Data from .ekpdat file (version 2 or later). See ``ekpy.analysis.read_ekpdat``.
+
+	returns:
+		(dict): Data dict
+	"""
+	with open(filename, 'rb') as f:
+		index = _read_ekpdat_index(f)
+	entries = {key:(definition, chunk) for key, definition, chunk in index}
+	if indices is None:
+		indices = list(entries)
+	missing = [key for key in indices if key not in entries]
+	if len(missing) != 0:
+		raise KeyError('indices {} not in {}. Available indices are {}'.format(missing, filename, list(entries)))
+
+	# map the whole file once, arrays are views into it
+	buffer = np.memmap(filename, mode = mmap_mode, dtype = np.uint8) if mmap_mode is not None else None
+
+	out = {}
+	with open(filename, 'rb') as f:
+		for key in indices:
+			definition, chunk = entries[key]
+			if chunk[0] == 'pickle':
+				f.seek(chunk[1])
+				out[key] = pickle.loads(f.read(chunk[2]))
+			elif lazy and buffer is None:
+				out[key] = {'definition':definition, 'data':_lazy_ekpdat_dict(filename, chunk[1])}
+			else:
+				out[key] = {'definition':definition, 'data':_read_arrays(f, buffer, chunk[1])}
+	return out
+
+def _read_arrays(f, buffer, arrays):
+	"""Read arrays ([(data key, offset, dtype, shape)]) of one chunk from f (file opened in binary mode) or, if not None, take views of buffer (the memory-mapped file)."""
+	data = {}
+	for data_key, offset, dtype, shape in arrays:
+		dtype = np.dtype(dtype)
+		count = int(np.prod(shape, dtype = np.int64))
+		if buffer is not None:
+			values = buffer[offset:offset + count*dtype.itemsize].view(dtype)
+		else:
+			f.seek(offset)
+			values = np.fromfile(f, dtype = dtype, count = count)
+		data[data_key] = values.reshape(shape)
+	return data
+
+
+class _lazy_ekpdat_dict(MutableMapping):
+	"""Data dict of a single Data index of a .ekpdat file whose arrays are read the first time it is accessed. Returned as 'data' by ``read_ekpdat(lazy=True)``. Once loaded behaves like a dict. Pickling loads the data and pickles a dict.
+
+	args:
+		filename (str): .ekpdat file
+		arrays (list): [(data key, offset, dtype, shape)] of the arrays of the index
+
+	"""
+
+	def __init__(self, filename, arrays):
+		self._filename = filename
+		self._arrays = arrays
+		self._data = None
+
+	@property
+	def is_loaded(self):
+		"""Whether the arrays have been read."""
+		return self._data is not None
+
+	def _load(self):
+		if self._data is None:
+			with open(self._filename, 'rb') as f:
+				self._data = _read_arrays(f, None, self._arrays)
+		return self._data
+
+	def __getitem__(self, key):
+		return self._load()[key]
+
+	def __setitem__(self, key, value):
+		self._load()[key] = value
+
+	def __delitem__(self, key):
+		del self._load()[key]
+
+	def __iter__(self):
+		if self._data is None:
+			# the keys are known without reading
+			return iter([data_key for data_key, offset, dtype, shape in self._arrays])
+		return iter(self._data)
+
+	def __len__(self):
+		if self._data is None:
+			return len(self._arrays)
+		return len(self._data)
+
+	def __repr__(self):
+		if self._data is None:
+			return '<not loaded: {} array(s) of {}>'.format(len(self._arrays), self._filename)
+		return pformat(self._data, indent=1)
+
+	def __reduce__(self):
+		return (dict, (dict(self._load()),))
+
+	def copy(self):
+		return dict(self._load())
@@ -0,0 +1,177 @@
+import io
+import json
+import pickle
+import struct
+
+import numpy as np
+import pandas as pd
+
+# .ekpds (Dataset) file layout, version 2:
+#	prefix: magic (8 bytes), version (uint16), number of sections (uint16)
+#	section table: for each section, name (8 bytes, padded with null bytes), offset from the start of the file and size (uint64)
+#	sections:
+#		info: utf-8 json. pointercolumn, paths and how to decode meta data (see _encode_values)
+#		meta: uncompressed npz. meta data columns, index and the path code of each row
+#		reader: pickled readfileby. Optional
+# Files written before version 2 are three pickles separated by b'########' and b'##|##|##|##', and are read by _read_legacy_ekpds.
+_EKPDS_MAGIC = b'\x93EKPYSET'
+_EKPDS_VERSION = 2
+_EKPDS_PREFIX = struct.Struct('<8sHH')
+_EKPDS_SECTION = struct.Struct('<8sQQ')
+
+# missing values of str columns
+_STR, _NAN, _NONE = 0, 1, 2
+
+
+def _encode_values(values, key, arrays):
+	"""Encode values (``pandas.Series`` or ``pandas.Index``) as arrays of a npz. Numpy columns are stored as they are. Object (and extension dtype) columns are stored as fixed width str if every value is a str or missing, so they are read without unpickling. Any other column is stored as pickled object array.
+
+	args:
+		values (pandas.Series or pandas.Index): Values
+		key (str): Name of the array in the npz, additional arrays are named key_<suffix>
+		arrays (dict): key -> numpy.ndarray. Updated with the arrays of values
+
+	returns:
+		(dict): json serializable description of how to decode the arrays
+	"""
+	spec = {'dtype':str(values.dtype), 'encoding':'numpy'}
+	if isinstance(values.dtype, np.dtype) and not values.dtype.hasobject:
+		arrays[key] = values.to_numpy()
+		return spec
+	if isinstance(values.dtype, pd.CategoricalDtype):
+		# codes, so that categories and their order are kept
+		arrays[key] = np.asarray(values.cat.codes if isinstance(values, pd.Series) else values.codes)
+		spec.update({
+			'encoding':'categorical', 
+			'ordered':bool(values.dtype.ordered), 
+			'categories':_encode_values(pd.Index(values.dtype.categories), key + '_categories', arrays)
+		})
+		return spec
+
+	objects = values.to_numpy(dtype = object)
+	missing = np.array([_NONE if x is None else _NAN if isinstance(x, (float, np.floating)) and np.isnan(x) else _STR for x in objects], dtype = np.uint8)
+	is_str = np.array([isinstance(x, str) for x in objects], dtype = bool)
+	if np.all(is_str | (missing != _STR)):
+		strings = np.where(is_str, objects, '')
+		arrays[key] = strings.astype(str) if len(strings) != 0 else np.array([], dtype = str)
+		arrays[key + '_missing'] = missing
+		spec['encoding'] = 'str'
+	else:
+		arrays[key] = objects
+		spec['encoding'] = 'pickle'
+	return spec
+
+def _decode_values(spec, key, arrays):
+	"""Inverse of _encode_values.
+
+	returns:
+		(numpy.ndarray or pandas.api.extensions.ExtensionArray): values
+	"""
+	values = arrays[key]
+	if spec['encoding'] == 'categorical':
+		categories = _decode_values(spec['categories'], key + '_categories', arrays)
+		return pd.Categorical.from_codes(values, categories = categories, ordered = spec['ordered'])
+	if spec['encoding'] == 'str':
+		values = values.astype(object)
+		missing = arrays[key + '_missing']
+		values[missing == _NAN] = np.nan
+		values[missing == _NONE] = None
+	if spec['dtype'] != str(values.dtype):
+		try:
+			values = pd.array(values, dtype = pd.api.types.pandas_dtype(spec['dtype']))
+		except (TypeError, ValueError):
+			# e.g. a dtype this version of pandas does not know, keep objects
+			pass
+	return values
+
+def _write_ekpds(filename, meta_data, paths, path_codes, pointercolumn, readfileby=None):
+	"""Write a Dataset to .ekpds file (version 2).
+
+	args:
+		filename (str): File name
+		meta_data (pandas.DataFrame): Meta data
+		paths (array-like): Unique paths (str)
+		path_codes (numpy.ndarray): Position in paths of the path of each row (-1 if none)
+		pointercolumn (str): Pointer column
+		readfileby (function or None): Stored pickled if not None
+
+	"""
+	arrays = {'path_codes':np.asarray(path_codes, dtype = np.int64)}
+	info = {
+		'pointercolumn':pointercolumn,
+		'paths':[str(path) for path in paths],
+		'nrows':len(meta_data),
+		'columns':_encode_values(pd.Index(meta_data.columns), 'columns', arrays),
+		'values':[_encode_values(meta_data.iloc[:, i], 'c{}'.format(i), arrays) for i in range(meta_data.shape[1])],
+	}
+	if not isinstance(meta_data.index, pd.RangeIndex) or not meta_data.index.equals(pd.RangeIndex(len(meta_data))):
+		info['index'] = _encode_values(meta_data.index, 'index', arrays)
+
+	meta = io.BytesIO()
+	np.savez(meta, **arrays)
+	sections = [(b'info', json.dumps(info).encode('utf-8')), (b'meta', meta.getvalue())]
+	if readfileby is not None:
+		sections.append((b'reader', pickle.dumps(readfileby)))
+
+	offset = _EKPDS_PREFIX.size + _EKPDS_SECTION.size*len(sections)
+	table = []
+	for name, section in sections:
+		table.append(_EKPDS_SECTION.pack(name, offset, len(section)))
+		offset += len(section)
+
+	with open(filename, 'wb') as f:
+		f.write(_EKPDS_PREFIX.pack(_EKPDS_MAGIC, _EKPDS_VERSION, len(sections)))
+		f.write(b''.join(table))
+		for name, section in sections:
+			f.write(section)
+
+def _is_ekpds_v2(f):
+	"""Whether f (opened in binary mode) is a .ekpds file of version 2 or later. Does not move f."""
+	position = f.tell()
+	magic = f.read(len(_EKPDS_MAGIC))
+	f.seek(position)
+	return magic == _EKPDS_MAGIC
+
+def _read_ekpds(f, load_readfileby=True):
+	"""Read .ekpds file (version 2 or later) opened in binary mode. Only the sections needed are read.
+
+	args:
+		f (file): File
+		load_readfileby (bool): Unpickle the stored readfileby, if any
+
+	returns:
+		(pandas.DataFrame, numpy.ndarray, numpy.ndarray, str, function or None): meta data, paths, path codes, pointercolumn, readfileby
+	"""
+	magic, version, nsections = _EKPDS_PREFIX.unpack(f.read(_EKPDS_PREFIX.size))
+	if version > _EKPDS_VERSION:
+		raise ValueError('{} is .ekpds version {}, this version of ekpy reads up to version {}. Please upgrade ekpy.'.format(getattr(f, 'name', f), version, _EKPDS_VERSION))
+	table = {}
+	for i in range(nsections):
+		name, offset, size = _EKPDS_SECTION.unpack(f.read(_EKPDS_SECTION.size))
+		table[name.rstrip(b'\x00')] = (offset, size)
+
+	def read_section(name):
+		offset, size = table[name]
+		f.seek(offset)
+		return f.read(size)
+
+	info = json.loads(read_section(b'info').decode('utf-8'))
+	encodings = [info['columns']] + info['values'] + ([info['index']] if 'index' in info else [])
+	encodings += [spec['categories'] for spec in encodings if spec['encoding'] == 'categorical']
+	with np.load(io.BytesIO(read_section(b'meta')), allow_pickle = any(spec['encoding'] == 'pickle' for spec in encodings)) as npz:
+		arrays = {key:npz[key] for key in npz.files}
+
+	columns = _decode_values(info['columns'], 'columns', arrays)
+	meta_data = pd.DataFrame(
+		{i:_decode_values(spec, 'c{}'.format(i), arrays) for i, spec in enumerate(info['values'])},
+		index = pd.Index(_decode_values(info['index'], 'index', arrays)) if 'index' in info else pd.RangeIndex(info['nrows']),
+	)
+	meta_data.columns = pd.Index(columns)
+
+	paths = np.empty(len(info['paths']), dtype = object)
+	paths[:] = info['paths']
+
+	readfileby = None
+	if load_readfileby and b'reader' in table:
+		readfileby = pickle.loads(read_section(b'reader'))
+	return meta_data, paths, arrays['path_codes'], info['pointercolumn'], readfileby
@@ -0,0 +1,509 @@
+import os
+import shutil
+import hashlib
+import pickle
+import uuid
+import threading
+import types
+import functools
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+__all__ = ('DiskCache', 'MemoryCache', 'memory_cache')
+
+_ENTRY_SUFFIX = '.ekpycache'
+_COLUMNS_FILE = 'columns.pkl'
+_STACKED_FILE = 'data.npy'
+
+# kwargs of readfileby which do not change the data that is returned
+_KWARGS_NOT_IN_KEY = {'skiprows', 'return_skiprows'}
+
+
+def _reader_name(readfileby):
+	"""Return the name of readfileby (module and qualified name)."""
+	module = getattr(readfileby, '__module__', None)
+	name = getattr(readfileby, '__qualname__', getattr(readfileby, '__name__', None))
+	if module is None or name is None:
+		return repr(readfileby)
+	return '{}.{}'.format(module, name)
+
+
+def _code_fingerprint(code):
+	"""Return the bytecode, constants and names of code object code, nested code objects (inner functions, lambdas) included."""
+	consts = tuple(_code_fingerprint(const) if isinstance(const, types.CodeType) else repr(const) for const in code.co_consts)
+	return (code.co_code, consts, code.co_names, code.co_varnames)
+
+
+def _value_fingerprint(value, _seen):
+	"""Return a description of value (a default, closure variable or argument of a reader) for ``_reader_fingerprint``."""
+	if callable(value) and not isinstance(value, type):
+		return _reader_fingerprint(value, _seen)
+	if isinstance(value, np.ndarray):
+		# repr of large arrays is truncated
+		return (value.dtype.str, value.shape, hashlib.sha1(value.tobytes()).hexdigest()) if not value.dtype.hasobject else repr(value.tolist())
+	if isinstance(value, (tuple, list)):
+		return (type(value).__name__,) + tuple(_value_fingerprint(v, _seen) for v in value)
+	if isinstance(value, dict):
+		return ('dict',) + tuple(sorted((repr(key), _value_fingerprint(v, _seen)) for key, v in value.items()))
+	return repr(value)
+
+
+def _reader_fingerprint(readfileby, _seen=None):
+	"""Return a description of readfileby, used as part of the cache key. Python functions are described by their name, code, defaults and closure, ``functools.partial`` by its function and arguments, bound methods by their function and instance and callable instances by the ``__call__`` of their class and their repr. A reader which is redefined with other code or parameters (*e.g.* a lambda or a function redefined in a notebook) therefore never gets the data of another reader. Functions called by readfileby (through its globals) are not part of the description.
+
+	args:
+		readfileby (function): How files are read
+
+	returns:
+		(tuple)
+	"""
+	_seen = set() if _seen is None else _seen
+	if id(readfileby) in _seen:
+		# recursive closure
+		return ('recursion', _reader_name(readfileby))
+	_seen = _seen | {id(readfileby)}
+
+	if isinstance(readfileby, functools.partial):
+		return (
+			'partial',
+			_reader_fingerprint(readfileby.func, _seen),
+			_value_fingerprint(readfileby.args, _seen),
+			_value_fingerprint(readfileby.keywords, _seen),
+		)
+	if isinstance(readfileby, types.MethodType):
+		return ('method', _reader_fingerprint(readfileby.__func__, _seen), repr(readfileby.__self__))
+
+	code = getattr(readfileby, '__code__', None)
+	if not isinstance(code, types.CodeType):
+		call = getattr(type(readfileby), '__call__', None)
+		if isinstance(call, types.FunctionType):
+			return ('instance', _reader_fingerprint(call, _seen), repr(readfileby))
+		# builtins
+		return (_reader_name(readfileby),)
+
+	closure = []
+	for cell in readfileby.__closure__ or ():
+		try:
+			closure.append(_value_fingerprint(cell.cell_contents, _seen))
+		except ValueError:
+			# empty cell
+			closure.append(None)
+	return (
+		_reader_name(readfileby),
+		_code_fingerprint(code),
+		_value_fingerprint(readfileby.__defaults__, _seen),
+		_value_fingerprint(readfileby.__kwdefaults__, _seen),
+		tuple(closure),
+	)
+
+
+def _cache_key(file, readfileby, **kwargs):
+	"""Return the cache key for file when read with readfileby. The key is built from the absolute path, size and modification time of the file and the code and parameters of readfileby (see ``_reader_fingerprint``), so neither a modified file nor a file read by a modified reader is served from the cache.
+
+	args:
+		file (str): Path to the file
+		readfileby (function): How the file is read
+		kwargs (kwargs): kwargs passed to readfileby
+
+	returns:
+		(str or None): key. None if file does not exist.
+	"""
+	abspath = os.path.abspath(file)
+	try:
+		stat = os.stat(abspath)
+	except OSError:
+		# leave it to readfileby to report the error
+		return None
+	kwargs = sorted((key, repr(kwargs[key])) for key in kwargs if key not in _KWARGS_NOT_IN_KEY)
+	to_hash = repr((abspath, stat.st_size, stat.st_mtime_ns, _reader_fingerprint(readfileby), kwargs))
+	return hashlib.sha1(to_hash.encode()).hexdigest()
+
+
+# absolute path of a directory -> (modification time, names of its entries)
+_directory_listings = {}
+_directory_listings_lock = threading.Lock()
+
+def _list_directory(path):
+	"""Return the names of the entries of directory path (as ``os.listdir``). Listings are cached and listed again only if the modification time of the directory changed, which is the case whenever an entry is added, removed or renamed.
+
+	args:
+		path (str): Path to the directory
+
+	returns:
+		(frozenset): names
+	"""
+	abspath = os.path.abspath(path)
+	mtime = os.stat(abspath).st_mtime_ns
+	with _directory_listings_lock:
+		listing = _directory_listings.get(abspath)
+	if listing is not None and listing[0] == mtime:
+		return listing[1]
+
+	with os.scandir(abspath) as entries:
+		names = frozenset(entry.name for entry in entries)
+	with _directory_listings_lock:
+		_directory_listings[abspath] = (mtime, names)
+	return names
+
+
+def _entry_size(entry_path):
+	return sum(entry.stat().st_size for entry in os.scandir(entry_path) if entry.is_file())
+
+
+class DiskCache():
+	"""On disk cache of parsed data files. The first time a file is read it is stored as binary in directory (a single 2D ``.npy`` if all columns share a dtype, otherwise one ``.npy`` per column). Later reads load the binary copy instead of parsing the file again. Entries are keyed by absolute path, size and modification time of the file and the code and parameters of readfileby (its bytecode, defaults, closure or ``functools.partial`` arguments), so changing a file or the reader invalidates its entries. Invalidated entries are no longer read and are evicted as least recently used. Only the columns and their values are cached, not the index of the ``pandas.DataFrame`` returned by readfileby.
+
+	args:
+		directory (str): Directory where the cache is stored. Created if it does not exist.
+		max_bytes (int or None): Maximum size of the cache in bytes. Least recently used entries are evicted when exceeded. None for no limit.
+		mmap_mode (str or None): ``numpy.load`` mmap_mode used when reading cached copies. 'r' or 'c' memory-map the arrays (zero-copy, but each array holds an open file handle until it is garbage collected). Default None reads the arrays into memory.
+
+	examples:
+
+		.. code-block:: python
+
+			>>> cache = DiskCache('./.ekpy_cache/', max_bytes=10e9)
+			>>> data = dset.get_data(cache=cache) # parses the files and populates the cache
+			>>> data = dset.get_data(cache=cache) # loads binary copies
+			>>> cache.stats
+			> {'hits': 11, 'misses': 11, 'evictions': 0, 'entries': 11, 'bytes': 99440, 'max_bytes': 10000000000.0}
+
+			>>> cache.clear_cache()
+
+	"""
+
+	def __init__(self, directory, max_bytes=None, mmap_mode=None):
+		if mmap_mode not in (None, 'r', 'c'):
+			raise ValueError('mmap_mode must be None, "r" or "c". Got {}'.format(mmap_mode))
+		self.directory = os.path.abspath(directory)
+		self.max_bytes = max_bytes
+		self.mmap_mode = mmap_mode
+		os.makedirs(self.directory, exist_ok=True)
+		self._reset_stats()
+		self._entries = self._scan_entries()
+
+	def __repr__(self):
+		return 'DiskCache({!r}, max_bytes={})'.format(self.directory, self.max_bytes)
+
+	def __len__(self):
+		return len(self._entries)
+
+	def _reset_stats(self):
+		self._hits = 0
+		self._misses = 0
+		self._evictions = 0
+
+	def _scan_entries(self):
+		"""Return OrderedDict of existing entries {key: size}, least recently used first."""
+		entries = []
+		for entry in os.scandir(self.directory):
+			if not entry.name.endswith(_ENTRY_SUFFIX) or not entry.is_dir():
+				continue
+			try:
+				last_used = os.stat(os.path.join(entry.path, _COLUMNS_FILE)).st_mtime_ns
+				entries.append((last_used, entry.name[:-len(_ENTRY_SUFFIX)], _entry_size(entry.path)))
+			except FileNotFoundError:
+				# incomplete entry
+				continue
+		return OrderedDict((key, size) for last_used, key, size in sorted(entries))
+
+	def _entry_path(self, key):
+		return os.path.join(self.directory, key + _ENTRY_SUFFIX)
+
+	@property
+	def nbytes(self):
+		"""Total size of the cache in bytes."""
+		return sum(self._entries.values())
+
+	@property
+	def stats(self):
+		"""Return cache statistics.
+
+		returns:
+			(dict): hits, misses (files which had to be read with readfileby and were stored) and evictions since creation (or last ``clear_cache``), number of entries, size in bytes and max_bytes.
+		"""
+		return {
+			'hits':self._hits,
+			'misses':self._misses,
+			'evictions':self._evictions,
+			'entries':len(self._entries),
+			'bytes':self.nbytes,
+			'max_bytes':self.max_bytes,
+		}
+
+	def contains(self, file, readfileby, **kwargs):
+		"""Whether file read with readfileby is in the cache.
+
+		args:
+			file (str): Path to the file
+			readfileby (function): How the file is read
+			kwargs (kwargs): kwargs passed to readfileby
+
+		returns:
+			(bool)
+		"""
+		key = _cache_key(file, readfileby, **kwargs)
+		return key is not None and key in self._entries
+
+	def get(self, file, readfileby, **kwargs):
+		"""Return the cached data for file or None if it is not in the cache.
+
+		args:
+			file (str): Path to the file
+			readfileby (function): How the file is read
+			kwargs (kwargs): kwargs passed to readfileby
+
+		returns:
+			(pandas.DataFrame or None): Data
+		"""
+		key = _cache_key(file, readfileby, **kwargs)
+		if key not in self._entries:
+			return None
+
+		entry_path = self._entry_path(key)
+		try:
+			columns_file = os.path.join(entry_path, _COLUMNS_FILE)
+			with open(columns_file, 'rb') as f:
+				columns, has_objects = pickle.load(f)
+			if has_objects is None:
+				# all columns stacked in a single 2D array, one row per column
+				stack = np.load(os.path.join(entry_path, _STACKED_FILE), mmap_mode=self.mmap_mode).view(np.ndarray)
+				out = pd.DataFrame(stack.T, columns=columns, copy=False)
+			else:
+				arrays = {}
+				for i, (col, has_object) in enumerate(zip(columns, has_objects)):
+					array = np.load(
+						os.path.join(entry_path, '{}.npy'.format(i)),
+						mmap_mode=None if has_object else self.mmap_mode,
+						allow_pickle=has_object,
+					)
+					arrays[col] = array.view(np.ndarray)
+				out = pd.DataFrame(arrays, copy=False)
+			os.utime(columns_file) # mark as recently used
+		except FileNotFoundError:
+			# removed from outside this object
+			self._entries.pop(key, None)
+			return None
+
+		self._entries.move_to_end(key)
+		self._hits += 1
+		return out
+
+	def put(self, file, readfileby, data, **kwargs):
+		"""Store data (as read from file with readfileby) in the cache. Evicts least recently used entries if the cache exceeds max_bytes.
+
+		args:
+			file (str): Path to the file
+			readfileby (function): How the file was read
+			data (pandas.DataFrame): Data returned by readfileby
+			kwargs (kwargs): kwargs passed to readfileby
+
+		"""
+		key = _cache_key(file, readfileby, **kwargs)
+		if key is None or key in self._entries:
+			return
+
+		# write to a temporary directory first so that a partially written entry is never read
+		tmp_path = os.path.join(self.directory, '{}.{}.tmp'.format(key, uuid.uuid4().hex))
+		os.mkdir(tmp_path)
+		columns = list(data.columns)
+		arrays = [np.asarray(data[col].values) for col in columns]
+		if len(arrays) != 0 and len({array.dtype for array in arrays}) == 1 and not arrays[0].dtype.hasobject and len(set(columns)) == len(columns):
+			# common case, every column has the same dtype: store a single 2D array
+			has_objects = None
+			np.save(os.path.join(tmp_path, _STACKED_FILE), np.stack(arrays))
+		else:
+			has_objects = []
+			for i, array in enumerate(arrays):
+				has_objects.append(array.dtype.hasobject)
+				np.save(os.path.join(tmp_path, '{}.npy'.format(i)), array, allow_pickle=array.dtype.hasobject)
+		with open(os.path.join(tmp_path, _COLUMNS_FILE), 'wb') as f:
+			pickle.dump((columns, has_objects), f)
+
+		entry_path = self._entry_path(key)
+		try:
+			os.rename(tmp_path, entry_path)
+		except OSError:
+			# written concurrently by another process
+			shutil.rmtree(tmp_path, ignore_errors=True)
+			if not os.path.isdir(entry_path):
+				raise
+
+		self._entries[key] = _entry_size(entry_path)
+		self._misses += 1
+		self._evict()
+
+	def _evict(self):
+		"""Evict least recently used entries until the cache is at most max_bytes. The most recent entry is kept."""
+		if self.max_bytes is None:
+			return
+		total = self.nbytes
+		while total > self.max_bytes and len(self._entries) > 1:
+			key, size = self._entries.popitem(last=False)
+			shutil.rmtree(self._entry_path(key), ignore_errors=True)
+			total -= size
+			self._evictions += 1
+
+	def clear_cache(self):
+		"""Remove all entries from the cache and reset the statistics."""
+		for entry in os.scandir(self.directory):
+			if entry.is_dir() and (entry.name.endswith(_ENTRY_SUFFIX) or entry.name.endswith('.tmp')):
+				shutil.rmtree(entry.path, ignore_errors=True)
+		self._entries = OrderedDict()
+		self._reset_stats()
+
+
+class MemoryCache():
+	"""In memory least recently used cache of parsed data files, keyed like :class:`DiskCache`. A process wide instance, ``memory_cache``, is shared by all Datasets so that ``Dataset.get_data`` on a Dataset derived from another (*e.g.* with ``query`` or ``head``) does not read files again. Like :class:`DiskCache` it is opt-in: ``memory_cache`` has a budget of 0 (disabled) until ``max_bytes`` is set. Arrays are copied in and out of the cache, so modifying returned data never modifies the cache.
+
+	args:
+		max_bytes (int): Memory budget in bytes. Least recently used entries are evicted when exceeded. 0 disables the cache. 
+
+	examples:
+
+		.. code-block:: python
+
+			>>> from ekpy.analysis import memory_cache
+			>>> memory_cache.max_bytes = 4e9 # enable with a 4 GB budget
+			>>> data = dset.get_data() # reads the files
+			>>> data = dset.query('high_voltage_v == .5').get_data() # no files are read
+			>>> memory_cache.stats
+			> {'hits': 5, 'misses': 55, 'evictions': 0, 'entries': 55, 'bytes': 660000, 'max_bytes': 4000000000.0}
+
+			# disable
+			>>> memory_cache.max_bytes = 0
+
+	"""
+
+	def __init__(self, max_bytes=1e9):
+		self._lock = threading.Lock()
+		self._entries = OrderedDict()
+		self._nbytes = 0
+		self._reset_stats()
+		self.max_bytes = max_bytes
+
+	def __repr__(self):
+		return 'MemoryCache(max_bytes={})'.format(self.max_bytes)
+
+	def __len__(self):
+		return len(self._entries)
+
+	def _reset_stats(self):
+		self._hits = 0
+		self._misses = 0
+		self._evictions = 0
+
+	@property
+	def max_bytes(self):
+		"""Memory budget in bytes. Setting a lower value evicts entries immediately."""
+		return self._max_bytes
+
+	@max_bytes.setter
+	def max_bytes(self, max_bytes):
+		if max_bytes is None or max_bytes < 0:
+			raise ValueError('max_bytes must be a non negative number. Got {}'.format(max_bytes))
+		with self._lock:
+			self._max_bytes = max_bytes
+			self._evict()
+
+	@property
+	def nbytes(self):
+		"""Total size of the cached arrays in bytes."""
+		return self._nbytes
+
+	@property
+	def stats(self):
+		"""Return cache statistics.
+
+		returns:
+			(dict): hits, misses (files which had to be read elsewhere and were stored) and evictions since creation (or last ``clear_cache``), number of entries, size in bytes and max_bytes.
+		"""
+		with self._lock:
+			return {
+				'hits':self._hits,
+				'misses':self._misses,
+				'evictions':self._evictions,
+				'entries':len(self._entries),
+				'bytes':self._nbytes,
+				'max_bytes':self._max_bytes,
+			}
+
+	def contains(self, file, readfileby, **kwargs):
+		"""Whether file read with readfileby is in the cache.
+
+		args:
+			file (str): Path to the file
+			readfileby (function): How the file is read
+			kwargs (kwargs): kwargs passed to readfileby
+
+		returns:
+			(bool)
+		"""
+		key = _cache_key(file, readfileby, **kwargs)
+		return key is not None and key in self._entries
+
+	def get(self, file, readfileby, **kwargs):
+		"""Return a copy of the cached data for file or None if it is not in the cache.
+
+		args:
+			file (str): Path to the file
+			readfileby (function): How the file is read
+			kwargs (kwargs): kwargs passed to readfileby
+
+		returns:
+			(pandas.DataFrame or None): Data
+		"""
+		key = _cache_key(file, readfileby, **kwargs)
+		with self._lock:
+			try:
+				arrays, nbytes = self._entries[key]
+			except KeyError:
+				return None
+			self._entries.move_to_end(key)
+			self._hits += 1
+		return pd.DataFrame(arrays)
+
+	def put(self, file, readfileby, data, **kwargs):
+		"""Store a copy of data (as read from file with readfileby) in the cache. Evicts least recently used entries if the cache exceeds max_bytes. Data larger than max_bytes is not stored.
+
+		args:
+			file (str): Path to the file
+			readfileby (function): How the file was read
+			data (pandas.DataFrame): Data returned by readfileby
+			kwargs (kwargs): kwargs passed to readfileby
+
+		"""
+		key = _cache_key(file, readfileby, **kwargs)
+		if key is None:
+			return
+		arrays = {col: np.array(data[col].values) for col in data.columns}
+		nbytes = sum(array.nbytes for array in arrays.values())
+		with self._lock:
+			if key in self._entries or nbytes > self._max_bytes:
+				return
+			for array in arrays.values():
+				array.flags.writeable = False
+			self._entries[key] = (arrays, nbytes)
+			self._nbytes += nbytes
+			self._misses += 1
+			self._evict()
+
+	def _evict(self):
+		"""Evict least recently used entries until the cache is at most max_bytes."""
+		while self._nbytes > self._max_bytes and len(self._entries) != 0:
+			key, (arrays, nbytes) = self._entries.popitem(last=False)
+			self._nbytes -= nbytes
+			self._evictions += 1
+
+	def clear_cache(self):
+		"""Remove all entries from the cache and reset the statistics."""
+		with self._lock:
+			self._entries = OrderedDict()
+			self._nbytes = 0
+			self._reset_stats()
+
+
+memory_cache = MemoryCache(max_bytes=0)
+"""Process wide :class:`MemoryCache` used by ``Dataset.get_data``. Disabled until ``max_bytes`` is set."""
@@ -7,34 +7,51 @@ import warnings
 import matplotlib.pyplot as plt
 from matplotlib import cm
 from functools import wraps
+from collections.abc import MutableMapping
+from collections import deque
+import itertools
 from numpy import AxisError
 import pickle
 from pprint import pformat
-from .data_funcs import iterable_data_dict, data_array_builder
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import inspect
+from .data_funcs import iterable_data_dict, data_array_builder, _is_batch_capable
+from .cache import memory_cache, _list_directory
+from ._bitmap_index import _bitmap_index, _query_bits, _to_positions
+from ._ekpds import _write_ekpds
+from ._ekpdat import _write_ekpdat
+from ._columnar import _columnar_store
 
 from ..utils import read_ekpy_data
+from ..utils.save import _select_usecols
 
 
-__all__ = ('Dataset', 'Data',)
+__all__ = ('Dataset', 'Data', 'ColumnarData')
 
 def construct_Dataset_from_dataframe(function):
 
 	@wraps(function)
 	def wrapper(*args, **kwargs):
 		dataframe = function(*args, **kwargs)
-		
-		index_to_path = args[0].index_to_path
-
-		map_new_index_to_old_index = {i:old for i, old in enumerate(dataframe.index)}
-		new_index_to_path = pd.Series({i:index_to_path[map_new_index_to_old_index[i]] for i in map_new_index_to_old_index})
+		dset = args[0]
 
-		new_path = _convert_ITP_to_path_to_index(new_index_to_path)
+		# rows of the new meta data keep the path of the row with the same index in the original
+		positions = dset.meta_data.index.get_indexer(dataframe.index)
+		if (positions < 0).any():
+			raise KeyError('index {} not in Dataset'.format(list(dataframe.index[positions < 0])))
 		dataframe.reset_index(inplace = True, drop = True)
 
-		return Dataset(path = new_path, initializer = dataframe, readfileby = args[0].readfileby)
+		return dset._with_meta_data(dataframe, positions)
 
 	return wrapper
 
+class _path_codes():
+	"""Paths of a Dataset stored as categories: the unique paths and, for each row of meta data, the position of its path in paths (-1 if none). Pass as path to ``Dataset`` to construct a Dataset without building a path dict."""
+
+	def __init__(self, paths, codes):
+		self.paths = paths
+		self.codes = codes
+
 def _convert_ITP_to_path_to_index(index_to_path):
 	"""Convert index_to_path (``pandas.Series``) to path_to_index (``dict``) 
 
@@ -45,7 +62,34 @@ def _convert_ITP_to_path_to_index(index_to_path):
 		(dict): path_to_index, key is path and value is list of indices for that path
 
 	"""
-	return {x:y.values for x,y in pd.Series(index_to_path.index, index = index_to_path.values).groupby(level=0)}
+	codes, paths = pd.factorize(index_to_path)
+	return _codes_to_path_to_index(np.asarray(paths, dtype = object), codes, index_to_path.index.to_numpy())
+
+def _codes_to_path_to_index(paths, codes, index):
+	"""Convert path codes to path_to_index (``dict``), sorted by path. Rows with code -1 are left out.
+
+	args:
+		paths (numpy.ndarray): Unique paths
+		codes (numpy.ndarray): Position in paths of the path of each row
+		index (numpy.ndarray): Index of each row
+
+	returns:
+		(dict): path_to_index, key is path and value is array of indices for that path
+
+	"""
+	valid = np.flatnonzero(codes >= 0)
+	order = valid[np.argsort(codes[valid], kind = 'stable')]
+	bounds = np.searchsorted(codes[order], np.arange(len(paths) + 1))
+	return {
+		paths[code]:index[order[bounds[code]:bounds[code + 1]]] 
+		for code in np.argsort(paths, kind = 'stable') if bounds[code + 1] > bounds[code]
+	}
+
+def _absolute_path(path):
+	abspath = (os.path.abspath(path)).replace('\\', '/')
+	if not abspath[-1] == '/':
+		abspath += '/' #put final slash in place
+	return abspath
 
 def _check_file_exists(path, filename):
 	if filename in set(os.listdir(path)):
@@ -54,6 +98,140 @@ def _check_file_exists(path, filename):
 		return False
 
 
+def _read_data_file(file, readfileby, **kwargs):
+	"""Read a single data file with readfileby. Module level so that it may be sent to a process pool.
+
+	args:
+		file (str): Full path to the file
+		readfileby (function): How to read the data.
+		kwargs (kwargs): kwargs to pass to readfileby. usecols and dtype are applied to the returned data instead if readfileby does not accept them (see ``Dataset.get_data``)
+
+	returns:
+		(pandas.DataFrame): Data
+	"""
+	not_accepted = {key:kwargs.pop(key) for key in ('usecols', 'dtype') if key in kwargs and not _accepts_kwarg(readfileby, key)}
+	try:
+		tdf = readfileby(file, **kwargs)
+	except Exception as e:
+		raise Exception('error reading data. ensure self.readfileby is correct and that readfileby returns a pandas dataframe. self.readfileby is currently set to {}.\nError was: {}'.format(getattr(readfileby, '__name__', repr(readfileby)), e))
+
+	if 'usecols' in not_accepted:
+		tdf = tdf[_select_usecols(list(tdf.columns), not_accepted['usecols'])]
+	if 'dtype' in not_accepted:
+		dtype = not_accepted['dtype']
+		if isinstance(dtype, dict):
+			dtype = {column:dtype[column] for column in dtype if column in tdf.columns}
+		tdf = tdf.astype(dtype)
+	return tdf
+
+def _accepts_kwarg(function, key):
+	"""Return True if function accepts keyword argument key (by name or through ``**kwargs``)."""
+	try:
+		parameters = inspect.signature(function).parameters
+	except (TypeError, ValueError):
+		return False
+	if key in parameters and parameters[key].kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY):
+		return True
+	return any(parameter.kind == inspect.Parameter.VAR_KEYWORD for parameter in parameters.values())
+
+def _reader_kwargs(columns=None, dtype=None):
+	"""Return the kwargs for readfileby for Dataset.get_data(columns, dtype)."""
+	kwargs = {}
+	if columns is not None:
+		kwargs['usecols'] = [columns] if isinstance(columns, str) else list(columns)
+	if dtype is not None:
+		kwargs['dtype'] = dtype
+	return kwargs
+
+def _check_parallel(parallel):
+	"""Raise ValueError if parallel is not one of False, True, 'thread' or 'process'."""
+	if parallel not in (False, True, 'thread', 'process'):
+		raise ValueError('parallel must be one of False, True, "thread" or "process". Got {}'.format(parallel))
+
+def _get_executor(parallel, max_workers):
+	"""Return the executor corresponding to parallel. True or 'thread' for a thread pool, 'process' for a process pool."""
+	_check_parallel(parallel)
+	if parallel == 'process':
+		return ProcessPoolExecutor(max_workers=max_workers)
+	return ThreadPoolExecutor(max_workers=max_workers)
+
+def _check_n_jobs(n_jobs):
+	"""Return the number of workers for n_jobs, -1 for one per CPU. Raise ValueError if n_jobs is not a positive int or -1."""
+	if isinstance(n_jobs, bool) or not isinstance(n_jobs, (int, np.integer)) or (n_jobs < 1 and n_jobs != -1):
+		raise ValueError('n_jobs must be a positive int or -1. Got {}'.format(n_jobs))
+	if n_jobs == -1:
+		return os.cpu_count() or 1
+	return int(n_jobs)
+
+def _stack_arrays(arrays):
+	"""Stack 1D arrays (one per file) into a single 2D array. The output is allocated once. If arrays have different lengths, shorter arrays are padded at the end with nans. A single array is returned as is.
+
+	args:
+		arrays (list): List of 1D arrays
+
+	returns:
+		(numpy.ndarray): 1D array if only one array is provided, otherwise 2D array with one row per array.
+
+	examples:
+
+		.. code-block:: python
+
+			>>> _stack_arrays([np.array([1, 2, 3]), np.array([4, 5])])
+			> array([[ 1.,  2.,  3.],
+				   [ 4.,  5., nan]])
+	"""
+	if len(arrays) == 1:
+		return arrays[0]
+
+	arrays = [np.asarray(array) for array in arrays]
+	for array in arrays:
+		if len(array.shape) != 1:
+			raise ValueError('Data is not 1 dimensional, meaning each row contains at least 2D data. Merging non-matching shapes is not allowed at higher dimensionality.')
+
+	lengths = [len(array) for array in arrays]
+	max_len = max(lengths)
+	dtype = np.result_type(*{array.dtype for array in arrays})
+
+	if min(lengths) == max_len:
+		out = np.empty((len(arrays), max_len), dtype=dtype)
+	else:
+		# ragged, pad with nans
+		try:
+			dtype = np.result_type(dtype, np.nan)
+		except TypeError: # e.g. str
+			dtype = object
+		out = np.full((len(arrays), max_len), np.nan, dtype=dtype)
+
+	for row, array in enumerate(arrays):
+		out[row, :len(array)] = array
+
+	return out
+
+def _build_data_dict(tdfs, columns_set=None):
+	"""Build the data dict of a single Data index from the data of its files. Data of each column is vstacked (see ``_stack_arrays``).
+
+	args:
+		tdfs (iterable): ``pandas.DataFrame`` for each file
+		columns_set (set or None): Columns every file must have. If None, set by the first file.
+
+	returns:
+		(dict, set): data dict, columns_set
+	"""
+	arrays = None
+	for tdf in tdfs:
+		if columns_set is None:
+			columns_set = set(tdf.columns)
+
+		if set(tdf.columns) != columns_set:
+			raise ValueError('not all data in this Dataset has the same columns!')
+
+		if arrays is None:
+			arrays = {col: [] for col in tdf.columns}
+		for col in arrays:
+			arrays[col].append(tdf[col].values)
+
+	return {col: _stack_arrays(arrays[col]) for col in arrays}, columns_set
+
 def _remove_nans_from_set(set_to_remove_from):
 	"""Remove multiple nans from a set."""
 
@@ -71,6 +249,27 @@ def _remove_nans_from_set(set_to_remove_from):
 		
 	return out
 
+def _unique_values(values):
+	"""Return the set of unique values (array-like) with multiple nans collapsed into a single ``np.nan``, as ``_remove_nans_from_set(set(values))``."""
+	uniques = np.asarray(pd.unique(values))
+	if uniques.dtype.kind in 'fcmM':
+		isnan = np.isnan(uniques)
+	elif uniques.dtype.kind == 'O':
+		isnan = np.array([_is_nan(value) for value in uniques], dtype = bool)
+	else:
+		return set(uniques)
+
+	out = set(uniques[~isnan])
+	if isnan.any():
+		out.add(np.nan)
+	return out
+
+def _is_nan(value):
+	try:
+		return bool(np.isnan(value))
+	except (TypeError, ValueError):
+		return False
+
 class Dataset():
 	"""Dataset class for analysis. Used to manipulate meta data while keeping track of location for the real data, which can be retrieved when necessary.
 
@@ -106,11 +305,13 @@ class Dataset():
 	def __init__(self, path, initializer, readfileby=read_ekpy_data, pointercolumn='filename'):
 		self.meta_data = pd.DataFrame(initializer)
 		self.attrs = dict()
-		self.attrs['path'] = path
-		self.attrs['index_to_path'] = self._construct_index_to_path(path, initializer)
+		self.attrs['paths'], self.attrs['path_codes'] = self._construct_path_codes(path)
+		# a path built from path codes is only converted to a dict when needed
+		self.attrs['path'] = None if isinstance(path, _path_codes) else path
 		self.pointercolumn = pointercolumn
 		self.readfileby = readfileby
-		self.skiprows = None
+		self._bitmap_indices = {}
+		self._bitmap_indices_key = None
 
 	def __str__(self):
 		return self.meta_data.__str__()
@@ -138,18 +339,25 @@ class Dataset():
 	@property
 	def path(self):
 		"""Return path to data."""
+		if self.attrs['path'] is None:
+			self.attrs['path'] = _codes_to_path_to_index(self.attrs['paths'], self.attrs['path_codes'], self.meta_data.index.to_numpy())
 		return self.attrs['path']
 
 	@property
 	def index_to_path(self):
-		"""Index to path ``pandas.Series``
+		"""Index to path ``pandas.Series`` (categorical)
 
 		returns:
 			(pandas.Series): Index to path
 
 
 		"""
-		return self.attrs['index_to_path']
+		codes = self.attrs['path_codes']
+		has_path = codes >= 0
+		return pd.Series(
+			pd.Categorical.from_codes(codes[has_path], categories = self.attrs['paths']), 
+			index = self.meta_data.index[has_path]
+		)
 
 	@property
 	def pretty_summary(self):
@@ -204,14 +412,110 @@ class Dataset():
 
 
 		"""
-		summary = dict()
-		for column in self.columns:
-			if column == self.pointercolumn:
-				continue
-			summary.update({column: _remove_nans_from_set(set(self.meta_data[column].values))})
+		# not memoized: meta_data may be modified in place
+		return {
+			column:_unique_values(self.meta_data[column].values) 
+			for column in self.columns if column != self.pointercolumn
+		}
+
+	def value_counts(self, column=None):
+		"""Return the number of rows with each value of column.
+
+		args:
+			column (str, label or None): Column to count. None counts every column except the pointercolumn.
+
+		returns:
+			(pandas.Series): Number of rows (values) for each value in column (index). nan is counted as a single value.
+			(dict): If column is None. keys are column names, values are ``pandas.Series`` of counts.
 
-		return summary
+		examples:
+
+			.. code-block:: python
+
+				>>> dset.value_counts('Temperature')
+				100    2
+				125    2
+				150    1
+
+		"""
+		if column is None:
+			return {column:self.value_counts(column) for column in self.columns if column != self.pointercolumn}
+
+		if column not in self.columns:
+			raise KeyError('column {} not in Dataset. Available columns are {}'.format(column, list(self.columns)))
+
+		return self.meta_data[column].value_counts(dropna = False, sort = False)
 	
+	def create_index(self, columns=None, max_cardinality=1024):
+		"""Create a bitmap index of columns of the meta data. ``query`` answers equality and ``in`` predicates (``==``, ``!=``, ``in``, ``not in`` with literals, combined with ``and``/``or``) on indexed columns by combining precomputed bitsets instead of evaluating the expression, anything else falls back to ``pandas.DataFrame.query``. ``filter_on_column`` on an indexed column evaluates function once per unique value instead of once per row. Datasets derived from this Dataset (``query``, ``head``, ``remove_index``, ...) keep the index.
+
+		The index is dropped if meta_data is replaced or changes length, but not if values of meta_data are modified in place: call ``create_index`` again after doing so.
+
+		args:
+			columns (str, label, array-like of or None): Columns to index. None indexes every column (except the pointercolumn) with at most max_cardinality unique values.
+			max_cardinality (int): Maximum number of unique values of an indexed column. Each unique value takes len(Dataset)/8 bytes.
+
+		returns:
+			(Dataset): self
+
+		examples:
+
+			.. code-block:: python
+
+				>>> dset.create_index(['high_voltage_v', 'pulsewidth_ns', 'identifier'])
+				>>> dset.query('high_voltage_v in [0.5, 1.0] and identifier == "185um"') # answered by the index
+				>>> dset.query('high_voltage_v > 0.5') # pandas.DataFrame.query
+
+		"""
+		indices = self._get_bitmap_indices()
+		if columns is None:
+			for column in self.columns:
+				if column == self.pointercolumn:
+					continue
+				try:
+					index = _bitmap_index.from_values(self.meta_data[column].values)
+				except TypeError:
+					continue # unhashable values
+				if len(index.uniques) <= max_cardinality:
+					indices[column] = index
+		else:
+			for column in np.array([columns]).flatten():
+				if column not in self.columns:
+					raise KeyError('column {} not in Dataset. Available columns are {}'.format(column, list(self.columns)))
+				index = _bitmap_index.from_values(self.meta_data[column].values)
+				if len(index.uniques) > max_cardinality:
+					raise ValueError('column {} has {} unique values, more than max_cardinality ({}).'.format(column, len(index.uniques), max_cardinality))
+				indices[column] = index
+		self._bitmap_indices_key = id(self.meta_data)
+		return self
+
+	def drop_index(self, columns=None):
+		"""Drop the bitmap index of columns (all indexed columns if None), see ``create_index``.
+
+		returns:
+			(Dataset): self
+		"""
+		if columns is None:
+			self._bitmap_indices = {}
+		else:
+			for column in np.array([columns]).flatten():
+				self._bitmap_indices.pop(column, None)
+		return self
+
+	@property
+	def indexed_columns(self):
+		"""Columns with a bitmap index, see ``create_index``."""
+		return list(self._get_bitmap_indices())
+
+	def _get_bitmap_indices(self):
+		"""Return the bitmap indices (dict column -> index) of meta_data. Indices are dropped if meta_data was replaced or its length or columns changed."""
+		if len(self._bitmap_indices) != 0 and self._bitmap_indices_key != id(self.meta_data):
+			self._bitmap_indices = {}
+		for column in list(self._bitmap_indices):
+			if column not in self.columns or len(self._bitmap_indices[column]) != len(self):
+				self._bitmap_indices.pop(column)
+		return self._bitmap_indices
+
 	@construct_Dataset_from_dataframe
 	def query(self, *args, **kwargs):
 		"""Query the columns of a Dataset with a boolean expression.
@@ -222,6 +526,11 @@ class Dataset():
 		Returns:
 			(Dataset): the result of the query
 		"""
+		indices = self._get_bitmap_indices()
+		if len(indices) != 0 and len(args) == 1 and len(kwargs) == 0 and isinstance(args[0], str):
+			bits = _query_bits(args[0], indices)
+			if bits is not None:
+				return self.meta_data.iloc[_to_positions(bits, len(self))]
 		return self.meta_data.query(*args, **kwargs)
 	
 	@construct_Dataset_from_dataframe
@@ -269,7 +578,13 @@ class Dataset():
 
 
 		"""
-		return self.meta_data[self.meta_data[column].apply(function, **kwargs_for_function).values].reset_index(drop = True)
+		index = self._get_bitmap_indices().get(column)
+		if index is not None:
+			# evaluate function once per unique value
+			bits = index.where(function, **kwargs_for_function)
+			if bits is not None:
+				return self.meta_data.iloc[_to_positions(bits, len(self))]
+		return self.meta_data[self.meta_data[column].apply(function, **kwargs_for_function).values]
 
 	@construct_Dataset_from_dataframe
 	def select_index(self, index):
@@ -283,56 +598,74 @@ class Dataset():
 
 
 		"""
-		return pd.DataFrame(self.meta_data.iloc[index]).T.reset_index(drop = True)
-
-	def _write_ekpds_file(self, filename):
-		preamble = 'pointercolumn:{}|path:{}'.format(self.pointercolumn, {key:list(self.path[key]) for key in self.path})
-		with open(filename, 'wb+') as f:
-			f.write(pickle.dumps(preamble))
-			f.write(b'########')
-			f.write(pickle.dumps(self.readfileby))
-			f.write(b'##|##|##|##')
-			f.write(pickle.dumps(self.meta_data))
-
+		return pd.DataFrame(self.meta_data.iloc[index]).T
+
+	def _write_ekpds_file(self, filename, save_readfileby=True):
+		_write_ekpds(
+			filename, 
+			self.meta_data, 
+			self.attrs['paths'], 
+			self.attrs['path_codes'], 
+			self.pointercolumn, 
+			readfileby = self.readfileby if save_readfileby else None
+		)
 		return
 	
-	def _construct_index_to_path(self, path, initializer):
-		"""Construct index_to_path from path provided
+	def _construct_path_codes(self, path):
+		"""Construct the path of each row of meta data from path provided. Each unique path is stored once, rows store the position of their path.
 
 		args:
-			path (str or Dict): A path to where the real data lives. if dict, form is {path: [indices of initializer for this path]}  
-			initializer (pandas.DataFrame): Meta data. one column must contain a pointer (filename) to where each the real data is stored
+			path (str, Dict or _path_codes): A path to where the real data lives. if dict, form is {path: [indices of initializer for this path]}  
+
+		returns:
+			(numpy.ndarray, numpy.ndarray): unique paths, position in unique paths of the path of each row (-1 if path does not provide one)
 
 		"""
 		if len(self) == 0:
 			warnings.showwarning("No meta data.", UserWarning, '', 0)
-			return {}
+			return np.array([], dtype = object), np.array([], dtype = np.int64)
+		if isinstance(path, _path_codes):
+			return path.paths, path.codes
 		if type(path) != dict:
 			assert type(path) == str, "path must be dict or str"
 			#set all indices to the single path provided
-			index_to_path = pd.Series({i:path for i in range(len(self.meta_data))}, dtype = 'object')
-		else:
-			for l, key in enumerate(path):
-				#path is {path:[indices]}, need inverse
-				if l == 0:
-					index_to_path = pd.Series(
-						{
-							i:key for i in path[key]
-						}
-					)
-				else:
-					#do not ignore index
-					index_to_path = pd.concat(
-						(
-							index_to_path,
-							pd.Series({i:key for i in path[key]})
-						)
-					)
+			return np.array([path], dtype = object), np.zeros(len(self), dtype = np.int64)
+
+		#path is {path:[indices]}, need inverse
+		paths = np.empty(len(path), dtype = object)
+		paths[:] = list(path)
+		indices = [np.asarray(path[key]).ravel() for key in path]
+		path_indices = pd.Index(np.concatenate(indices)) if len(indices) != 0 else pd.Index([])
 		#check for duplicate indices:
-		if len(index_to_path) != len(set(index_to_path.index)):
+		if not path_indices.is_unique:
 			raise ValueError('Duplicate indices provided in path dict!')
+		if len(path_indices) == 0:
+			return paths, np.full(len(self), -1, dtype = np.int64)
+
+		path_codes = np.repeat(np.arange(len(paths)), [len(x) for x in indices])
+		positions = path_indices.get_indexer(self.meta_data.index)
+		return paths, np.where(positions >= 0, path_codes[positions], -1)
 
-		return index_to_path
+	def _with_meta_data(self, meta_data, positions=None):
+		"""Return a Dataset with meta_data, sharing readfileby, pointercolumn and paths with self. 
+
+		args:
+			meta_data (pandas.DataFrame): Meta data of the new Dataset
+			positions (array-like or None): Position in self of each row of meta_data. None if meta_data has the rows of self.
+
+		returns:
+			(Dataset): Dataset
+		"""
+		path_codes = self.attrs['path_codes'] if positions is None else self.attrs['path_codes'][positions]
+		dset = Dataset(_path_codes(self.attrs['paths'], path_codes), meta_data, readfileby=self.readfileby, pointercolumn=self.pointercolumn)
+
+		# rows keep their values, so the bitmap indices can be carried over
+		dset._bitmap_indices = {
+			column:(index if positions is None else index.take(positions)) 
+			for column, index in self._get_bitmap_indices().items() if column in dset.columns
+		}
+		dset._bitmap_indices_key = id(dset.meta_data)
+		return dset
 	
 	def remove_index(self, index):
 		"""
@@ -347,77 +680,59 @@ class Dataset():
 		"""
 		index = np.array([index]).flatten()
 
-		#adjust index_to_path and convert to path_to_index
-		path = _convert_ITP_to_path_to_index(self.index_to_path.drop(index = index).reset_index(drop = True))
-		meta_data = self.meta_data.drop(index = index).reset_index(drop = True)
-		return Dataset(path, meta_data, readfileby=self.readfileby)
+		meta_data = self.meta_data.drop(index = index)
+		positions = self.meta_data.index.get_indexer(meta_data.index)
+		return self._with_meta_data(meta_data.reset_index(drop = True), positions)
 
 
 	def remove_nonexistent_files_from_metadata(self):
 		"""
 		Remove references to files that do not exist in path. This may occur, for example, if you know certain data files are bad (and thus delete them from the data dir), but did not delete them while collecting data. 
+
+		Directory listings are cached until the directory is modified, so checking the same path again (*e.g.* loading the same Dataset twice) does not list it again.
 		"""
-		# determine available paths in the dataset
-		if type(self.path) == str:
-			paths = {self.path:self.meta_data.index.values}
-		else:
-			paths = self.path
-			
-		remove_index = []
-			
-		for path in paths:
-			indices_to_check = paths[path]
-			existing_files = set(os.listdir(path))
-			pointercolumn_values_for_path = self.meta_data.iloc[indices_to_check][self.pointercolumn].values
-			
-			for index, value in zip(indices_to_check, pointercolumn_values_for_path):
-				if value not in existing_files:
-					remove_index.append(index)
+		codes = self.attrs['path_codes']
+		pointers = pd.Series(self.meta_data[self.pointercolumn].to_numpy(dtype = object), dtype = object)
 
-		return self.remove_index(remove_index)
+		# rows without a path are kept
+		keep = np.ones(len(self), dtype = bool)
+		for code in np.unique(codes[codes >= 0]):
+			rows = codes == code
+			keep[rows] = pointers[rows].isin(_list_directory(self.attrs['paths'][code])).to_numpy()
+
+		positions = np.flatnonzero(keep)
+		return self._with_meta_data(self.meta_data.iloc[positions].reset_index(drop = True), positions)
 
 
 	def _group(self, by, level=None):
-		"""Group data by 'by' and return a pandas dataframe. makes use of pandas.groupby
+		"""Group data by 'by' and return a pandas dataframe. makes use of pandas.groupby. Each row of the returned dataframe is one group: the pointercolumn holds a dict {index: pointer} of the rows in the group, all other columns hold the set of values appearing in the group.
 
 		args:
-			by (str, int, label or array-like of): on what to group. 
-		"""
-		groups = self.meta_data.groupby(by = by, level = level).groups
-		for ijk, key in enumerate(groups):
-			original_dataset_indices = groups[key]
-			new_row = None
-			for index in original_dataset_indices:
-				original_row = self.meta_data.loc[index] #this is a pandas series of a row from the original dataset
-				#columns in this row
-				if type(new_row) == type(None):
-					#import pdb; pdb.set_trace()
-					new_row = {col:dict({index:original_row[col]}) for col in original_row.index}
-				else:
-					for col in new_row:
-						#import pdb; pdb.set_trace()
-						new_row[col].update(dict({index:original_row[col]}))
-
-			for col in new_row:
-				if col != self.pointercolumn:
-					new_row[col] = set(list([new_row[col][x] for x in new_row[col].keys()]))
-
-			if ijk == 0:
-				new_df = pd.DataFrame(
-					{key:[new_row[key]] for key in new_row}
-				)
+			by (str, int, label or array-like of): on what to group. Multiple keys are grouped hierarchically.
+			level (int, level name or array-like of): level of the index to group on. Used when by is None.
+		"""
+		meta_data = self.meta_data
+
+		# group number of each row. rows with nan in by are dropped by pandas
+		codes = meta_data.groupby(by = by, level = level).ngroup().fillna(-1).to_numpy(dtype = np.int64)
+		positions = np.flatnonzero(codes >= 0)
+		order = positions[np.argsort(codes[positions], kind = 'stable')]
+		groups = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1) if len(order) != 0 else []
+		all_singletons = len(groups) == len(order)
+
+		index = meta_data.index.to_numpy(dtype = object)
+
+		new_df = {}
+		for col in meta_data.columns:
+			values = meta_data[col].to_numpy()
+			if col == self.pointercolumn:
+				new_df[col] = [dict(zip(index[group], values[group])) for group in groups]
+			elif all_singletons:
+				new_df[col] = [{value} for value in values[order]]
 			else:
-				new_df = pd.concat(
-					(
-						new_df, 
-						pd.DataFrame(
-							{key:[new_row[key]] for key in new_row}
-						)
-					),
-					ignore_index = True
-				)
-
-		return new_df   
+				new_df[col] = [set(values[group]) for group in groups]
+
+		return pd.DataFrame(new_df, columns = meta_data.columns)
 
 	def add_calculated_column(self, column_name, how):
 		"""Add a calculated column to the Dataset.
@@ -474,11 +789,12 @@ class Dataset():
 		else:
 			pass
 
-	def to_ekpds(self, path):
-		"""Save Dataset to file (extension .ekpds).
+	def to_ekpds(self, path, save_readfileby=True):
+		"""Save Dataset to file (extension .ekpds). Meta data is stored by column, and paths and readfileby in their own sections, so ``read_ekpds`` can load the meta data without unpickling readfileby.
 
 		args:
 			path (str): Path to save location
+			save_readfileby (bool): Store readfileby (pickled). False if readfileby cannot be pickled, *e.g.* a lambda; pass readfileby to ``read_ekpds`` instead.
 
 		example:
 
@@ -498,11 +814,11 @@ class Dataset():
 			yn = input('file ({}) already exists. Overwrite? (y/n)'.format(path))
 			if yn.lower() == 'y':
 				os.remove(path)
-				self._write_ekpds_file(path)
+				self._write_ekpds_file(path, save_readfileby)
 			else:
 				pass
 		else:
-			self._write_ekpds_file(path)
+			self._write_ekpds_file(path, save_readfileby)
 
 		return 
 
@@ -511,37 +827,23 @@ class Dataset():
 
 	def _set_index_to_path_absolute(self):
 		"""Modify ``.index_to_path`` to absolute paths."""
-		itp = self.index_to_path
-
-		for ind, x in zip(itp.index, itp):
-			abspath = (os.path.abspath(x)).replace('\\', '/')
-			if not abspath[-1] == '/':
-				abspath += '/' #put final slash in place
+		abspaths = np.empty(len(self.attrs['paths']), dtype = object)
+		abspaths[:] = [_absolute_path(x) for x in self.attrs['paths']]
 
-			itp.at[ind] = abspath
+		# different paths may point to the same directory
+		paths, inverse = np.unique(abspaths, return_inverse = True)
+		codes = self.attrs['path_codes']
+		self.attrs['paths'] = paths
+		self.attrs['path_codes'] = np.where(codes >= 0, inverse[codes], -1) if len(paths) != 0 else codes
 
 		return
 
 	def _set_path_absolute(self):
 		"""Modify ``.path`` to absolute paths."""
 		if type(self.path) == str:
-			abspath = (os.path.abspath(self.path)).replace('\\', '/')
-			if not abspath[-1] == '/':
-				abspath += '/' #put final slash in place
-			out = abspath
+			out = _absolute_path(self.path)
 		elif type(self.path) == dict:
-			pdict = self.path
-			new_pdict = {}
-			for key in pdict:
-				indices = pdict[key]
-
-				abspath = (os.path.abspath(key)).replace('\\', '/')
-				if not abspath[-1] == '/':
-					abspath += '/' #put final slash in place
-
-				new_pdict.update({abspath:indices})
-			del pdict
-			out = new_pdict
+			out = {_absolute_path(key):indices for key, indices in self.path.items()}
 		else:
 			raise TypeError('Only str or dict supported as self.path. Please report this issue.')
 
@@ -559,17 +861,105 @@ class Dataset():
 			column_data (array-like): The data for the column
 
 		"""
-		path_to_index = _convert_ITP_to_path_to_index(self.index_to_path)
 		self.meta_data[column_name] = column_data
-		return Dataset(path_to_index, self.meta_data)      
+		self._bitmap_indices.pop(column_name, None)
+		return self._with_meta_data(self.meta_data)
+
+	def _iter_read_files(self, files, parallel=False, max_workers=None, cache=None, reader_kwargs=None):
+		"""Read files, yielding a ``pandas.DataFrame`` for each file in the order of files. Files are loaded from the process wide ``memory_cache`` if enabled, then from cache. The rest are read with self.readfileby (see ``_iter_parse_files``). Files are stored in every cache they were not found in.
+
+		args:
+			files (array-like): Full paths to the files to read
+			parallel (bool or str): False reads serially. True or 'thread' reads with a thread pool, 'process' reads with a process pool.
+			max_workers (int or None): Maximum number of workers for parallel reads. None uses the ``concurrent.futures`` default.
+			cache (DiskCache or None): Cache of parsed files.
+			reader_kwargs (dict or None): kwargs for self.readfileby (usecols, dtype). Part of the cache key.
+
+		"""
+		if reader_kwargs is None:
+			reader_kwargs = {}
+		caches = [c for c in (memory_cache, cache) if c is not None and c.max_bytes != 0]
+		if len(caches) == 0:
+			yield from self._iter_parse_files(files, parallel=parallel, max_workers=max_workers, reader_kwargs=reader_kwargs)
+			return
+
+		readfileby = self.readfileby
+		files = list(files)
+		cached = [any(c.contains(file, readfileby, **reader_kwargs) for c in caches) for file in files]
+		tdfs = self._iter_parse_files(
+			[file for file, is_cached in zip(files, cached) if not is_cached], 
+			parallel=parallel, 
+			max_workers=max_workers,
+			reader_kwargs=reader_kwargs
+		)
+		try:
+			for file, is_cached in zip(files, cached):
+				tdf = None
+				found_in = len(caches)
+				if is_cached:
+					for found_in, c in enumerate(caches):
+						tdf = c.get(file, readfileby, **reader_kwargs)
+						if tdf is not None:
+							break
+					else:
+						# entry was evicted since checking
+						found_in = len(caches)
+						tdf = _read_data_file(file, readfileby, **reader_kwargs)
+				else:
+					tdf = next(tdfs)
+
+				for c in caches[:found_in]:
+					c.put(file, readfileby, tdf, **reader_kwargs)
+				yield tdf
+		finally:
+			tdfs.close()
+
+	def _iter_parse_files(self, files, parallel=False, max_workers=None, reader_kwargs=None):
+		"""Read files with self.readfileby, yielding a ``pandas.DataFrame`` for each file in the order of files.
+
+		args:
+			files (array-like): Full paths to the files to read
+			parallel (bool or str): False reads serially. True or 'thread' reads with a thread pool, 'process' reads with a process pool.
+			max_workers (int or None): Maximum number of workers for parallel reads. None uses the ``concurrent.futures`` default.
+			reader_kwargs (dict or None): kwargs for self.readfileby (usecols, dtype)
 
-	def get_data(self, groupby=None, labelby=None,):
+		"""
+		if reader_kwargs is None:
+			reader_kwargs = {}
+		# every file is read on its own (read_ekpy_data scans the heading of each file), so there is no state shared between reads
+		readfileby = self.readfileby
+		if not parallel:
+			for file in files:
+				yield _read_data_file(file, readfileby, **reader_kwargs)
+			return
+
+		with _get_executor(parallel, max_workers) as executor:
+			futures = [executor.submit(_read_data_file, file, readfileby, **reader_kwargs) for file in files]
+			try:
+				for future in futures:
+					# results (and errors) are returned in the order of files
+					yield future.result()
+			finally:
+				for future in futures:
+					future.cancel()
+
+	def get_data(self, groupby=None, labelby=None, parallel=False, max_workers=None, cache=None, lazy=False, columns=None, dtype=None):
 		"""
 		Return data in Data (Data class) for the current Dataset. If using groupby kwarg, resulting Data will vstack all data which corresponds to that grouping. (See examples)
 		
 		args:
 				groupby (str, label, index or array-like of):  what to group on
 				labelby (str, label, index or array-like of):  what to label the output data by. This will change 'definition' in output Data class
+				parallel (bool or str): Read files in parallel. True or 'thread' uses a thread pool, 'process' uses a process pool (useful for CPU bound readfileby, readfileby must then be picklable). Default False reads serially. 
+				max_workers (int or None): Maximum number of workers when reading in parallel. None uses the ``concurrent.futures`` default.
+				cache (DiskCache or None): Opt-in on disk cache of parsed files (see :class:`DiskCache <.cache.DiskCache>`). Files in the cache are loaded from their binary copy instead of being read with readfileby. Files not in the cache are read and stored.
+				lazy (bool): If True, no files are read until they are needed. The data dict of each index is a proxy which reads (and vstacks) the files of that index the first time it is accessed. ``definition``, ``summary``, ``contains`` and ``sort`` of the resulting Data do not read any files. 
+				columns (str, array-like of or None): Only read these columns of each file. None reads all columns.
+				dtype (type name, dict of column -> type or None): dtype to read the data as, e.g. 'float32' to halve memory of float64 data. None keeps the dtype of readfileby.
+
+		columns and dtype are passed to readfileby as ``usecols`` and ``dtype`` keyword arguments (only if not None), with the meaning of ``pandas.read_csv`` (the default ``read_ekpy_data`` accepts both). A custom readfileby should accept them, by name or through ``**kwargs``, to skip parsing unused columns. If readfileby does not accept them, the columns are selected and converted after reading.
+
+		If enabled, files are first looked up in the process wide in memory cache, ``ekpy.analysis.memory_cache`` (see :class:`MemoryCache <.cache.MemoryCache>`), which is shared with every other Dataset. It is disabled by default, set ``memory_cache.max_bytes`` to a budget in bytes to enable it (0 disables it again).
 
 		returns:
 				(Data): the data
@@ -637,134 +1027,255 @@ class Dataset():
 		"""
 		if len(self) == 0:
 			raise ValueError('No meta data to return data for!!')
-		pointercolumn = self.pointercolumn
-		readfileby = self.readfileby
+		_check_parallel(parallel)
+
+		definitions, files_by_group = self._plan_data(groupby, labelby)
+		return self._read_data(
+			definitions, 
+			files_by_group, 
+			parallel=parallel, 
+			max_workers=max_workers, 
+			cache=cache, 
+			lazy=lazy, 
+			reader_kwargs=_reader_kwargs(columns, dtype)
+		)
+
+	def iter_data(self, groupby=None, labelby=None, batch_size=1, parallel=False, max_workers=None, cache=None, columns=None, dtype=None):
+		"""
+		Iterate over the data of the current Dataset, yielding Data with (at most) batch_size indices at a time. Only the files of the current batch are read, and a batch is released once the next one is requested, so Datasets larger than memory can be processed. Grouping and labeling are identical to ``get_data``: concatenating the yielded Data gives ``get_data(groupby, labelby)``.
+
+		args:
+			groupby (str, label, index or array-like of):  what to group on
+			labelby (str, label, index or array-like of):  what to label the output data by. This will change 'definition' in output Data class
+			batch_size (int): Number of groups (Data indices) in each yielded Data.
+			parallel (bool or str): Read files in parallel, see ``get_data``.
+			max_workers (int or None): Maximum number of workers when reading in parallel.
+			cache (DiskCache or None): Opt-in on disk cache of parsed files, see ``get_data``.
+			columns (str, array-like of or None): Only read these columns of each file, see ``get_data``.
+			dtype (type name, dict of column -> type or None): dtype to read the data as, see ``get_data``.
+
+		yields:
+			(Data): Data of batch_size groups, indexed from 0.
 
-		read_eky_data = self.readfileby.__name__ == 'read_ekpy_data'
+		examples:
 
+			.. code-block:: python
+
+				>>> means = []
+				>>> for data in dset.iter_data(groupby='high_voltage_v', batch_size=10):
+				...	means.append(data.apply(some_function).to_DataFrame())
+				>>> pd.concat(means, ignore_index=True)
+
+		"""
+		if len(self) == 0:
+			raise ValueError('No meta data to return data for!!')
+		_check_parallel(parallel)
+		if int(batch_size) != batch_size or batch_size < 1:
+			raise ValueError('batch_size must be a positive integer. Got {}'.format(batch_size))
+		batch_size = int(batch_size)
+
+		reader_kwargs = _reader_kwargs(columns, dtype)
+		definitions, files_by_group = self._plan_data(groupby, labelby)
+		for start in range(0, len(definitions), batch_size):
+			yield self._read_data(
+				definitions[start:start+batch_size], 
+				files_by_group[start:start+batch_size], 
+				parallel=parallel, 
+				max_workers=max_workers, 
+				cache=cache,
+				reader_kwargs=reader_kwargs
+			)
+
+	def _plan_data(self, groupby=None, labelby=None):
+		"""Group the meta data and return what is needed to build the Data, without reading any files.
+
+		args:
+			groupby (str, label, index or array-like of):  what to group on
+			labelby (str, label, index or array-like of):  what to label the output data by
+
+		returns:
+			(list, list): definition of each group, full paths to the files of each group
+		"""
 		if type(groupby) == type(None):
 			data_to_retrieve = self._group(by = None, level = 0) # gives us a unique col for each
 		else:
 			data_to_retrieve = self._group(by = groupby)
 
-		out = {}
-		for counter, i in enumerate(data_to_retrieve.index): # for each row
-			# NOTE data_to_retrieve.at[i, self.pointercolumn] is a dict
-			filename_index_to_path_dict = data_to_retrieve.at[i, self.pointercolumn]
-			for k, index_of_original in enumerate(filename_index_to_path_dict):
-				try:
-					if read_eky_data:
-						if self.skiprows is None:
-							tdf, skiprows = readfileby(
-								os.path.join(self.index_to_path[index_of_original], filename_index_to_path_dict[index_of_original]), 
-								return_skiprows=True
-								)
-							self.skiprows = skiprows
-						else:
-							tdf = readfileby(
-								os.path.join(self.index_to_path[index_of_original], filename_index_to_path_dict[index_of_original]), 
-								skiprows=self.skiprows
-								)
+		# NOTE data_to_retrieve.at[i, self.pointercolumn] is a dict
+		index_to_path = self.index_to_path
+		index_to_path = dict(zip(index_to_path.index, index_to_path.to_numpy(dtype = object)))
+		files_by_group = [
+			[
+				os.path.join(index_to_path[index_of_original], filename_index_to_path_dict[index_of_original])
+				for index_of_original in filename_index_to_path_dict
+			]
+			for filename_index_to_path_dict in data_to_retrieve[self.pointercolumn]
+		]
+
+		definition_columns = [col for col in self.columns if col != self.pointercolumn]
+		if type(labelby) != type(None):
+			labelby = set(np.array([labelby]).flatten())
+			definition_columns = [col for col in definition_columns if col in labelby]
+
+		definitions = [
+			{col: data_to_retrieve.at[i, col] for col in definition_columns} 
+			for i in data_to_retrieve.index
+		]
+		return definitions, files_by_group
+
+	def _read_data(self, definitions, files_by_group, parallel=False, max_workers=None, cache=None, lazy=False, reader_kwargs=None):
+		"""Read the files of each group and return the Data. See ``_plan_data``.
 
-					else:
-						tdf = readfileby(
-							os.path.join(self.index_to_path[index_of_original], filename_index_to_path_dict[index_of_original])
-							)
-				except Exception as e:
-					raise Exception('error reading data. ensure self.readfileby is correct and that readfileby returns a pandas dataframe. self.readfileby is currently set to {}.\nError was: {}'.format(self.readfileby.__name__, e))
-
-				if i == 0:
-					columns_set = set(tdf.columns)
-
-				if set(tdf.columns) != columns_set:
-					raise ValueError('not all data in this Dataset has the same columns!')
-
-				if k == 0: #build the internal data out
-					internal_out = (
-						{
-							'definition': {col: data_to_retrieve.at[i, col] for col in self.columns},
-							'data': {col: tdf[col].values for col in tdf.columns}
-						}
-					)
+		args:
+			definitions (list): Definition of each group
+			files_by_group (list): Full paths to the files of each group
+			parallel (bool or str): Read files in parallel
+			max_workers (int or None): Maximum number of workers when reading in parallel
+			cache (DiskCache or None): Cache of parsed files
+			lazy (bool): Defer reading until the data of a group is accessed
+			reader_kwargs (dict or None): kwargs for self.readfileby (usecols, dtype)
 
-				else:
-					try: #catch ValueError if the concatenation fails for having different lengths. Allows us to merge data of different lengths
-						for col in columns_set:
-							internal_out['data'].update({col: np.vstack((internal_out['data'][col], tdf[col].values))})
-					except ValueError as e:
-						if 'all the input array dimensions for the concatenation axis must match exactly' in str(e):
-							for col in columns_set:
-								current_stack = internal_out['data'][col]
-								if len(current_stack.shape) != 2: 
-									if len(current_stack.shape) == 1:
-										current_stack = np.reshape(current_stack, (1, len(current_stack)))
-									else:
-										raise ValueError('Current vstack is not 2 dimensional, meaning each row contains at least 2D data. Merging non-matching shapes is not allowed at higher dimensionality.')
-								current_nrows = current_stack.shape[0]
-								current_len = current_stack.shape[1]
-								new_len = max((current_len, len(tdf[col].values)))
-								for index in range(current_nrows):
-									row = current_stack[index, :]
-									n_nans_to_add = new_len - len(row)
-									row = np.concatenate((row, np.array([np.nan for i in range(n_nans_to_add)])))
-									if index == 0:
-										new_stack = row
-									else:
-										new_stack = np.vstack((new_stack, row))
-
-								new_data = tdf[col].values
-								to_stack_on_end = np.concatenate((new_data, np.array([np.nan for i in range(new_len - len(new_data))])))
-								internal_out['data'].update({col:np.vstack((new_stack,to_stack_on_end))})
-						else:
-							raise(e)
-					
+		returns:
+			(Data): the data
+		"""
+		out = {}
+		if lazy:
+			for counter, (definition, files) in enumerate(zip(definitions, files_by_group)):
+				out.update({counter:{
+					'definition': definition,
+					'data': _lazy_data_dict(self, files, parallel=parallel, max_workers=max_workers, cache=cache, reader_kwargs=reader_kwargs)
+				}})
+			return Data(out)
 
-			out.update({counter:internal_out})
+		tdfs = self._iter_read_files(
+			[file for files in files_by_group for file in files], 
+			parallel=parallel, 
+			max_workers=max_workers, 
+			cache=cache,
+			reader_kwargs=reader_kwargs
+		)
+		try:
+			columns_set = None
+			for counter, (definition, files) in enumerate(zip(definitions, files_by_group)):
+				data, columns_set = _build_data_dict(itertools.islice(tdfs, len(files)), columns_set)
+				out.update({counter:{'definition': definition, 'data': data}})
+		finally:
+			tdfs.close() # stop any outstanding parallel reads
 
-		for counter in out:
-			definition = out[counter]['definition']
-			try:
-				definition.pop(self.pointercolumn)
-			except:
-				pass
+		return Data(out)
 
-		if type(labelby) == type(None):
-			return Data(out)
+def _check_condition(condition):
+	"""Check condition of ``Data.contains`` (each value is a non str iterable)."""
+	for key in condition:
+		if not hasattr(condition[key], '__iter__'):
+			raise AttributeError('iterable not provided as value in condition arg. value associated with key "{}" is type {}'.format(key, type(condition[key])))
 
+		if type(condition[key]) == str:
+			raise TypeError('condition value must not be str. check key: {}.'.format(key) + ' try {' +  '"{}": ["{}"]'.format(key, condition[key]) + '}?')
 
-		labelby = set(np.array([labelby]).flatten())
+class _definition_index():
+	"""Inverted index of the definitions of a Data: for each definition key, each value mapped to the set of indices whose definition contains it. Built by ``Data._get_definition_index``.
 
-		for counter in out:
-			#pop off the labels we don't want
-			definition = out[counter]['definition']
-			to_pop = set(definition.keys()) - labelby
-			for key in to_pop:
-				try:
-					definition.pop(key)
-				except KeyError:
-					pass
-		return Data(out)
+	args:
+		_dict (dict): Dict representation of Data object.
 
-def _check_definition_contains_or(definition_dict, key, values):
-		"""need docstring"""
-		out = False
+	"""
+
+	def __init__(self, _dict):
+		self.positions = {}
+		self.values = {}
+		self.counts = {}
+		for position, (index, entry) in enumerate(_dict.items()):
+			self.positions[index] = position
+			for key, values in entry['definition'].items():
+				key_values = self.values.setdefault(key, {})
+				self.counts[key] = self.counts.get(key, 0) + 1
+				for value in values:
+					key_values.setdefault(value, set()).add(index)
+
+	def indices(self, key, values):
+		"""Return the set of indices whose definition of key contains any of values. Values are matched by equality, nan matches nothing.
+
+		raises:
+			KeyError: if the definition of an index does not have key
+		"""
+		if self.counts.get(key, 0) != len(self.positions):
+			raise KeyError(key)
+		out = set()
 		for value in values:
-			if (np.array(list(definition_dict[key])) == value).any():
-				out = True
-				break
+			try:
+				if value != value: # nan
+					continue
+				out.update(self.values[key].get(value, ()))
+			except (TypeError, ValueError): # unhashable or array-like
+				continue
 		return out
 
-def _summarize_data(data):
-	out = {}
-	for index in data:
-		defn = data[index]['definition']
-		for key in defn:
-			try:
-				out[key].update(_remove_nans_from_set(set({value for value in defn[key]})))
-			except KeyError:
-				out.update({key:_remove_nans_from_set(set({value for value in defn[key]}))})
-	return out
+	def ordered(self, indices):
+		"""Return indices (iterable) as a list in the order of the Data."""
+		return sorted(indices, key = self.positions.__getitem__)
+
+	def summary(self):
+		"""Return the set of values of each definition key (see ``Data.summary``)."""
+		return {key:_remove_nans_from_set(set(values)) for key, values in self.values.items()}
 		
+class _lazy_data_dict(MutableMapping):
+	"""Data dict of a single Data index whose files are read the first time it is accessed. Returned as 'data' by ``Dataset.get_data(lazy=True)``. Once loaded behaves like the dict returned by ``Dataset.get_data()``. Pickling loads the data and pickles a dict.
+
+	args:
+		dataset (Dataset): Dataset the files belong to.
+		files (list): Full paths to the files of this index.
+		read_kwargs (kwargs): kwargs for ``Dataset._iter_read_files`` (parallel, max_workers, cache, reader_kwargs)
+
+	"""
+
+	def __init__(self, dataset, files, **read_kwargs):
+		self._dataset = dataset
+		self._files = files
+		self._read_kwargs = read_kwargs
+		self._data = None
+
+	@property
+	def is_loaded(self):
+		"""Whether the files have been read."""
+		return self._data is not None
+
+	def _load(self):
+		if self._data is None:
+			tdfs = self._dataset._iter_read_files(self._files, **self._read_kwargs)
+			try:
+				self._data, _ = _build_data_dict(tdfs)
+			finally:
+				tdfs.close()
+			self._dataset = None
+		return self._data
+
+	def __getitem__(self, key):
+		return self._load()[key]
+
+	def __setitem__(self, key, value):
+		self._load()[key] = value
+
+	def __delitem__(self, key):
+		del self._load()[key]
+
+	def __iter__(self):
+		return iter(self._load())
+
+	def __len__(self):
+		return len(self._load())
+
+	def __repr__(self):
+		if self._data is None:
+			return '<not loaded: {} file(s)>'.format(len(self._files))
+		return pformat(self._data, indent=1)
+
+	def __reduce__(self):
+		return (dict, (dict(self._load()),))
+
+	def copy(self):
+		return dict(self._load())
+
 class iDataIndexer():
 	
 	def __init__(self, initializer):
@@ -849,12 +1360,16 @@ class Data():
 
 	def __init__(self, initializer):
 		self._dict = dict(initializer)
+		self._definition_index = None
 		
 	def __getitem__(self, key):
 		try:
-			return self._dict.__getitem__(key)
+			entry = self._dict.__getitem__(key)
 		except KeyError:
 			return self.__getattr__(key)
+		# the entry may be modified in place
+		self._definition_index = None
+		return entry
 
 	def __iter__(self):
 		return self._dict.__iter__()
@@ -880,6 +1395,7 @@ class Data():
 			return self._get_data_attr(key)
 
 	def _get_defn_attr(self, key):
+		self._definition_index = None # the sets may be modified in place
 		if len(self) == 1:
 			return self._dict[list(self._dict.keys())[0]]['definition'][key]
 
@@ -892,6 +1408,7 @@ class Data():
 		return {i:self._dict[i]['data'][key] for i in self._dict}
 
 	def _get_defn_or_data(self, key):
+		self._definition_index = None # definitions may be modified in place
 		if len(self) == 1:
 			return self._dict[list(self._dict.keys())[0]][key]
 
@@ -912,6 +1429,7 @@ class Data():
 				>>> Data.iloc[0]
 
 		"""
+		self._definition_index = None # entries may be modified in place
 		return iDataIndexer(self._dict.copy())
 
 	@property 
@@ -922,7 +1440,7 @@ class Data():
 			(dict): summary of the data included
 
 		"""
-		return _summarize_data(self._dict.copy())
+		return self._get_definition_index().summary()
 
 	@property
 	def data_keys(self):
@@ -939,10 +1457,19 @@ class Data():
 		
 		args:
 			data (ekpy.analysis.core.Data): The data to group
-			key (str): Key to group on
+			key (str or list of): Key to group on. A list of keys is grouped hierarchically, i.e. by the first key, then within each group by the second and so on.
 			
 		returns:
 			(ekpy.analysis.core.Data)
+
+		examples:
+
+			.. code-block:: python
+
+				>>> data.groupby('high_voltage_v')
+
+				# one index per (high_voltage_v, identifier) pair
+				>>> data.groupby(['high_voltage_v', 'identifier'])
 		"""
 		return _group_data(self, key)
 
@@ -951,30 +1478,29 @@ class Data():
 		return _drop_data_nans(self) 
 
 	def to_ekpdat(self, file):
-		"""Save file as `.ekpdat` file.
+		"""Save file as `.ekpdat` file. The arrays of each index are stored as they are, in a chunk of their own, so ``read_ekpdat`` can read (or memory-map) some indices without reading the whole file. Indices whose data are not all numeric arrays are pickled.
 
 		args:
 			file (str): Path to file
 		"""
-		with open(file, 'wb') as f:
-			pickle.dump(self._dict, f)
+		_write_ekpdat(file, self._dict)
 
-	def _get_indices_satisfying_definition_condtion(self, condition):
-		"""need docstring"""
-		for key in condition:
-			if not hasattr(condition[key], '__iter__'):
-				raise AttributeError('iterable not provided as value in condition arg. value associated with key "{}" is type {}'.format(key, type(condition[key])))
+	def _get_definition_index(self):
+		"""Return the ``_definition_index`` of the definitions, built the first time it is needed. A Data derived from this one (``contains``, ``sort``, ...) builds its own. The index is dropped whenever entries or definitions are handed out (``__getitem__``, ``iloc``, ``to_dict``, ``definition`` and definition attributes), as they may then be modified in place, so internal code reads ``self._dict``."""
+		index = self.__dict__.get('_definition_index') # not set if pickled before it existed
+		if index is None or len(index.positions) != len(self._dict):
+			index = self._definition_index = _definition_index(self._dict)
+		return index
 
-			if type(condition[key]) == str:
-				raise TypeError('condition value must not be str. check key: {}.'.format(key) + ' try {' +  '"{}": ["{}"]'.format(key, condition[key]) + '}?')
+	def _get_indices_satisfying_definition_condtion(self, condition):
+		"""Return the indices whose definition satisfies condition for each key of condition, i.e. an index appears once per key it satisfies."""
+		_check_condition(condition)
 
 		indices = [] #to hold which data satisfies condition
 
+		definition_index = self._get_definition_index()
 		for condition_key in condition:
-			for index in self._dict:
-				defn = self._dict[index]['definition']
-				if _check_definition_contains_or(defn, condition_key, condition[condition_key]):
-					indices.append(index)
+			indices.extend(definition_index.ordered(definition_index.indices(condition_key, condition[condition_key])))
 		return indices
 
 	def filter(self, data_condition_function_dict, definition_condition_dict=None, additional_data_keys_to_filter=None):
@@ -1077,18 +1603,15 @@ class Data():
 
 
 		"""
-		indices = self._get_indices_satisfying_definition_condtion(condition)
+		_check_condition(condition)
 
-		#we will append the index to indices everytime the logical or statement for the specific condition holds
-		#to check the logical and statement over various keys, we need to ensure that for each key we did indeed append the index to indices:
-		indices = np.array(indices)
-		indices_set = set(indices)
-		indices_out = []
-		for index in indices_set:
-			if len(indices[indices == index]) == len(condition.keys()):
-				indices_out.append(index)
-			else:
-				pass
+		#logical or over the values of each key is the union of their indices, logical and over the keys the intersection
+		definition_index = self._get_definition_index()
+		indices_out = set()
+		for i, key in enumerate(condition):
+			indices = definition_index.indices(key, condition[key])
+			indices_out = indices if i == 0 else indices_out.intersection(indices)
+		indices_out = definition_index.ordered(indices_out)
 
 
 		#build the final Data:
@@ -1166,7 +1689,7 @@ class Data():
 		return out
 
 	def apply(self, func:'callable', pass_defn:'bool'=False, pass_trials_iteratively:'bool'=True,
-		ignore_errors:'bool'=True, ignore_coerce_warnings:'bool'=True, **kwargs):
+		ignore_errors:'bool'=True, ignore_coerce_warnings:'bool'=True, mode:'str'='trial', n_jobs:'int'=1, backend:'str'='process', **kwargs):
 		"""Apply data_function to the data in each index. ``**kwargs`` will be passed to data_function. If function_on_data returns 'None', that piece of data will be dropped. 
 
 		args:
@@ -1175,6 +1698,9 @@ class Data():
 			pass_trials_iteratively (bool): True for functions which operate on a single trial. False for functions which operate across trials. (Only used for grouped data)
 			ignore_errors (bool): If True, errors in function_on_data will be printed, but not raised. Resulting data will be original data. If False, errors will be raised.
 			ignore_coerce_warnings (bool): Whether or not to ignore coerce warnings in data_array_builder() class. Most likely want this false.
+			mode (str): With pass_trials_iteratively, 'trial' calls function_on_data once per trial. 'batch' calls it once with the (n_trials, n_samples) arrays of all indices whose arrays have the same number of samples (once per index if pass_defn), for functions declared with ``ekpy.analysis.batch_capable``. Indices whose batch fails, or functions not batch capable, are applied trial by trial.
+			n_jobs (int): Number of workers the indices are split across. 1 applies function_on_data in this process, -1 uses one worker per CPU. The output (order, errors) is the same as with 1.
+			backend (str): With n_jobs other than 1, 'process' for a process pool (function_on_data and kwargs must be picklable, the arrays are passed to the workers through shared memory, or pickled before Python 3.8) or 'thread' for a thread pool (for functions which release the GIL).
 
 		returns:
 				(Data): the new data after operating on it
@@ -1252,70 +1778,57 @@ class Data():
        			>>> data.groupby('param').apply(subtract_offset, pass_trials_iteratively=False)
        			> {0: {'data': {'x': array([[ 0.5], [-0.5]])},'definition': {'param': {'a'}}}}
 
+			Batched trials
+
+			.. code-block:: python
+
+				>>> @analysis.batch_capable
+				... def subtract_offset(data_dict):
+				... 	return {'x':data_dict['x']-np.mean(data_dict['x'], axis=-1, keepdims=True)}
+
+				# one call for the trials of all indices
+				>>> data.groupby('param').apply(subtract_offset, mode='batch')
+				> {0: {'data': {'x': array([[0.], [0.]])}, 'definition': {'param': {'a'}}}}
+
+			In parallel
+
+			.. code-block:: python
+
+				# indices split across 4 worker processes, function_on_data must be defined at module level
+				>>> data.apply(subtract_offset, n_jobs=4)
+				> {	0: {'data': {'x': array([0.])}, 'definition': {'param': {'a'}}},
+ 					1: {'data': {'x': array([0.])}, 'definition': {'param': {'a'}}}}
+
 		"""
+		if mode not in ('trial', 'batch'):
+			raise ValueError("mode must be 'trial' or 'batch'. Not '{}'".format(mode))
+		if mode == 'batch' and not _is_batch_capable(func):
+			warnings.warn('{} is not declared batch capable (see ekpy.analysis.batch_capable). It is applied trial by trial.'.format(getattr(func, '__name__', repr(func))))
+			mode = 'trial'
+		n_jobs = _check_n_jobs(n_jobs)
+		if backend not in ('process', 'thread'):
+			raise ValueError("backend must be 'process' or 'thread'. Not '{}'".format(backend))
+
+		if n_jobs > 1 and len(self) > 1:
+			results = _apply_parallel(self, func, mode, pass_defn, pass_trials_iteratively, ignore_errors, ignore_coerce_warnings, kwargs, n_jobs, backend)
+		elif mode == 'batch' and pass_trials_iteratively:
+			results = _apply_batched(self, func, pass_defn, ignore_coerce_warnings, kwargs)
+		else:
+			results = _apply_by_index(self, func, pass_defn, pass_trials_iteratively, ignore_coerce_warnings, kwargs)
+
 		_dict_out = {}
 		new_key = 0
 		
-		for index in self:
-			try:
-				data_dict = self.iloc[index].data
-				defn = self.iloc[index].definition
-
-				if pass_trials_iteratively:
-					
-					_idd = iterable_data_dict(data_dict)
-					
-					dabs = {}
-					
-					for _dict in _idd:
-						if pass_defn:
-							#ensure no overlap between passed arguments and definition arguments:
-							overlap = set(kwargs.keys()).intersection(set(defn.keys()))
-							if len(overlap) != 0:
-								raise ValueError('There are matching function arguments passed in both definition and as kwargs in .apply(). Overlapping keys are "{}"'.format(overlap))
-
-							to_pass = defn.copy()
-							to_pass.update(kwargs)
-							_func_out = func(_dict, **to_pass)
-						else:
-							_func_out = func(_dict, **kwargs)
-						for key in _func_out:
-							try:
-								dabs[key].append(_func_out[key])
-							except:
-								dabs.update({key:data_array_builder()})
-								dabs[key].append(_func_out[key])
-					out = {}
-					for key in dabs:
-						out.update({key:dabs[key].build(ignore_coerce_warnings=ignore_coerce_warnings)})
-				   
-					_dict_out.update({new_key:{'definition':defn, 'data':out}})
-					new_key+=1
-				else:
-					if pass_defn:
-						#ensure no overlap between passed arguments and definition arguments:
-						overlap = set(kwargs.keys()).intersection(set(defn.keys()))
-						if len(overlap) != 0:
-							raise ValueError('There are matching function arguments passed in both definition and as kwargs in .apply(). Overlapping keys are "{}"'.format(overlap))
-
-						to_pass = defn.copy()
-						to_pass.update(kwargs)
-						_func_out = func(data_dict, **to_pass)
-					else:
-						_func_out = func(data_dict, **kwargs)
-					
-					if type(_func_out) is not dict:
-						raise TypeError('Function {} did not return dict.'.format(func.__name__))
-					_dict_out.update({new_key:{'definition':defn, 'data':_func_out}})
-					new_key+=1
-
-			except Exception as e:
+		for index, defn, out in results:
+			if isinstance(out, Exception):
 				if ignore_errors:
-					print('Error in data_function: {} \n{}'.format(func.__name__, e))
-					print('Skipping data key: {} with defintion: \n{}'.format(key, defn))
-				else:
-					raise e
+					print('Error in data_function: {} \n{}'.format(getattr(func, '__name__', repr(func)), out))
+					print('Skipping data key: {} with defintion: \n{}'.format(index, defn))
+					continue
+				raise out
 
+			_dict_out.update({new_key:{'definition':defn, 'data':out}})
+			new_key+=1
 			
 		return Data(_dict_out)
 
@@ -1326,8 +1839,17 @@ class Data():
 
 		returns:
 			(dict): a dict class with identical structure"""
+		self._definition_index = None # entries may be modified in place
 		return self._dict
 
+	def to_columnar(self):
+		"""Return the data as ``ColumnarData``, where the arrays of each data key are stored in one contiguous buffer and selections on the definitions (``contains``, ``sort``, ``summary``) do not loop over the indices in Python.
+
+		returns:
+			(ColumnarData): the same data
+		"""
+		return ColumnarData(self._dict)
+
 
 	def to_DataFrame(self, how='lump_mean', include_defn_keys=[], defn_converter=None):
 		"""Convert `Data` to pandas.DataFrame. Each index in `Data` will correspond to a single row in the resulting DataFrame. 
@@ -1771,6 +2293,273 @@ class _data_sorter():
 		return self
 
 
+class ColumnarData(Data):
+	"""``Data`` stored by column. The definitions are kept with, for each definition key, the (index, value) pairs as codes, and the arrays of each data key are concatenated in one contiguous buffer with the offset and shape of each index. ``contains``, ``sort``, ``summary``, ``iloc`` and ``collapse`` work on these arrays instead of looping over the indices, and selecting indices does not copy any data. Typically retrieved via ``Data.to_columnar()``. 
+
+	Any other method works as for ``Data``, on the dict given by ``to_dict()``, and returns ``ColumnarData`` where ``Data`` returns ``Data``. Entries are rebuilt on access (arrays are views of the buffers), so changing them in place does not change the ``ColumnarData``. Use ``Data(columnar_data.to_dict())`` to go back to a dict backed ``Data``.
+
+	args:
+		initializer (dict or Data): a dict with the form of ``Data`` (see ``Data``), or Data
+
+	examples:
+
+		.. code-block:: python
+
+			>>> data = dset.get_data().to_columnar()
+			>>> len(data)
+			> 100000
+
+			# selections do not loop over the indices in Python
+			>>> data.contains({'high_voltage_v':[0.5, 1.0]}).sort(by = 'trial')
+
+			# the dict round trip gives the same Data, so any function for Data.apply works as is
+			>>> data.apply(some_function)
+
+	"""
+
+	def __init__(self, initializer):
+		if isinstance(initializer, ColumnarData):
+			self._store, self._rows, self._keys = initializer._store, initializer._rows, initializer._keys
+			self._positions = None
+			return
+		if isinstance(initializer, Data):
+			initializer = initializer.to_dict()
+		initializer = dict(initializer)
+		self._store = _columnar_store(list(initializer.values()))
+		self._rows = np.arange(len(initializer), dtype = np.int64)
+		self._keys = list(initializer.keys())
+		self._positions = None
+
+	@classmethod
+	def _from_rows(cls, store, rows):
+		"""ColumnarData of rows (numpy.ndarray of positions) of store, with indices 0, 1, ..."""
+		out = cls.__new__(cls)
+		out._store, out._rows, out._keys = store, np.asarray(rows, dtype = np.int64), list(range(len(rows)))
+		out._positions = None
+		return out
+
+	def _row(self, key):
+		"""Row in the store of index key, raises KeyError if key is not an index."""
+		if self._positions is None:
+			self._positions = {k:i for i, k in enumerate(self._keys)}
+		return self._rows[self._positions[key]]
+
+	@property
+	def _dict(self):
+		return self.to_dict()
+
+	def __getitem__(self, key):
+		try:
+			return self._store.entry(self._row(key))
+		except (KeyError, TypeError):
+			return self.__getattr__(key)
+
+	def __iter__(self):
+		return iter(self._keys)
+
+	def __str__(self):
+		return self.to_dict().__str__()
+
+	def __repr__(self):
+		return pformat(self.to_dict(), indent=1,)
+
+	def __len__(self):
+		return len(self._keys)
+
+	def __getattr__(self, key):
+		if key.startswith('_'):
+			# not set (yet), e.g. while unpickling
+			raise AttributeError(key)
+		return Data.__getattr__(self, key)
+
+	def _get_defn_attr(self, key):
+		if len(self) == 1:
+			return self._store.definitions[self._rows[0]][key]
+
+		return {i:definition[key] for i, definition in zip(self._keys, self._store.definitions[self._rows])}
+
+	def _get_data_attr(self, key):
+		if key not in self._store.data_columns:
+			raise KeyError(key)
+		column = self._store.data_columns[key]
+		if not column.present[self._rows].all():
+			raise KeyError(key)
+		if len(self) == 1:
+			return column.get(self._rows[0])
+
+		return {i:column.get(row) for i, row in zip(self._keys, self._rows)}
+
+	def _get_defn_or_data(self, key):
+		get = self._store.definitions.__getitem__ if key == 'definition' else self._store.data
+		if len(self) == 1:
+			return get(self._rows[0])
+
+		return {i:get(row) for i, row in zip(self._keys, self._rows)}
+
+	@property
+	def iloc(self):
+		"""
+		An indexer as in pandas .iloc Usage is Data.iloc[index]
+
+		returns:
+			(iDataIndexer): indexer for indexing
+		"""
+		return iDataIndexer(self)
+
+	@property 
+	def summary(self):
+		"""Return a summary of the definitions in data
+
+		returns:
+			(dict): summary of the data included
+
+		"""
+		out = {}
+		for key in self._store.definition_keys(self._rows):
+			out.update({key:_remove_nans_from_set(set(self._store.definition_column(key).present_values(self._rows)))})
+		return out
+
+	@property
+	def data_keys(self):
+		"""
+		Return a list of keys corresponding to data. 
+
+		returns:
+			(list): data keys
+		"""
+		return list(self._store.data_keys[self._rows[0]])
+
+	def groupby(self, key:'str'):
+		"""Group data by key. See ``Data.groupby``.
+
+		returns:
+			(ekpy.analysis.core.ColumnarData)
+		"""
+		return ColumnarData(_group_data(self, key))
+
+	def dropna(self):
+		"""Drop nans from data"""
+		return ColumnarData(_drop_data_nans(self))
+
+	def _get_indices_satisfying_definition_condtion(self, condition):
+		"""Boolean array, whether the definition of each index satisfies condition (see ``contains``)."""
+		_check_condition(condition)
+
+		out = np.ones(len(self), dtype = bool)
+		for key in condition:
+			column = self._store.definition_column(key)
+			if not column.has_key[self._rows].all():
+				raise KeyError(key)
+			out &= column.rows_with(column.codes_of(condition[key]))[self._rows]
+		return out
+
+	def filter(self, data_condition_function_dict, definition_condition_dict=None, additional_data_keys_to_filter=None):
+		"""Filter the data. See ``Data.filter``.
+
+		returns:
+			(ColumnarData): filtered Data
+		"""
+		return ColumnarData(Data(self.to_dict()).filter(data_condition_function_dict, definition_condition_dict, additional_data_keys_to_filter))
+
+	def contains(self, condition):
+		"""Returns data specified by condition. See ``Data.contains``.
+
+		args:
+			condition (dict): key is definition key, value is value to find. Multiple values provided will be joined by logical OR. Multiple keys will be joined with logical AND.
+
+		returns:
+			(ColumnarData): data satisfying condition 
+		"""
+		return ColumnarData._from_rows(self._store, self._rows[self._get_indices_satisfying_definition_condtion(condition)])
+
+	def mean(self, across_trials:'bool'=True):
+		"""Return mean of Data. See ``Data.mean``.
+
+		returns:
+			(ColumnarData)
+		"""
+		return ColumnarData(Data(self.to_dict()).mean(across_trials = across_trials))
+
+	def collapse(self, data_key):
+		"""
+		Return collapsed (numpy.array) data corresponding to data_key. This will return all data for all indices concatenated into a single array.
+
+		args:
+			data_key (key): Key for data you wish to collapse
+
+		returns:
+			(numpy.array): Concatenated array of all data corresponding to data_key for all indices in self. 
+
+		"""
+		column = self._store.data_columns[data_key]
+		if not column.present[self._rows].all():
+			raise KeyError(data_key)
+		return column.gather(self._rows)
+
+	def apply(self, func:'callable', *args, **kwargs):
+		"""Apply data_function to the data in each index. See ``Data.apply``, functions receive the same dicts.
+
+		returns:
+			(ColumnarData): the new data after operating on it
+		"""
+		return ColumnarData(Data.apply(self, func, *args, **kwargs))
+
+	def to_dict(self):
+		"""
+		Return a dict of the Data class. Arrays are views of the buffers.
+
+		returns:
+			(dict): a dict class with identical structure"""
+		return {key:self._store.entry(row) for key, row in zip(self._keys, self._rows)}
+
+	def to_columnar(self):
+		"""Return self, already ``ColumnarData``."""
+		return self
+
+	def to_DataFrame(self, *args, **kwargs):
+		"""Convert to pandas.DataFrame. See ``Data.to_DataFrame``."""
+		return Data(self.to_dict()).to_DataFrame(*args, **kwargs)
+
+	def plot(self, *args, **kwargs):
+		"""Plot. See ``Data.plot``."""
+		return Data(self.to_dict()).plot(*args, **kwargs)
+
+	def scatter(self, *args, **kwargs):
+		"""Scatter plot. See ``Data.scatter``."""
+		return Data(self.to_dict()).scatter(*args, **kwargs)
+
+	def sort(self, by, key=None, reverse=False):
+		"""
+		Sort `Data` by definition key. See ``Data.sort``. Indices with equal values keep their order.
+
+		args:
+			by (str or key): Definition key. The definition key that you are sorting on must be unique for each index in your `Data` object. 
+			key (function): Method for accessing value to sort.
+			reverse (bool): Reverse order
+
+		returns:
+			(ColumnarData): Sorted Data
+		"""
+		column = self._store.definition_column(by)
+		if not column.has_key[self._rows].all():
+			raise KeyError(by)
+		counts = column.counts()[self._rows]
+		if (counts != 1).any():
+			i = np.flatnonzero(counts != 1)[0]
+			raise AssertionError("Definition for index '{}' is not unique. It contains multiple values: {}. Cannot sort.".format(self._keys[i], self._store.definitions[self._rows[i]][by]))
+
+		if type(key) == type(None):
+			key = lambda x: x
+
+		# sort the distinct values once, then the indices by the rank of their value
+		codes, inverse = np.unique(column.first_codes()[self._rows], return_inverse = True)
+		sort_values = np.array([key(value) for value in column.values[codes]])
+		argsort = np.argsort(sort_values[inverse], kind = 'stable')
+		if reverse:
+			argsort = argsort[::-1]
+		return ColumnarData._from_rows(self._store, self._rows[argsort])
+
+
 def _get_unique_definition_value_for_key(definition_dict, key):
 	"""docstring"""
 	_set = definition_dict[key]
@@ -1798,103 +2587,361 @@ def _lump_mean(ndarray, dropna=True, *args, **kwargs):
 	return np.mean(ndarray[good_indexer])
 
 
-def _update_definition_dict(current:'dict <key:set>', updater:'dict <key:set>'):
-	"""Update `current` definition dict, by union on keys with updater.
+def _group_data(data:'ekpy.analysis.core.Data', key:'str'):
+	"""Group data by key. Similar to Dataset.get_data(groupby=key).get_data(), though offers one to perform functions on individual data files before grouping.
+
+	Indices are put in buckets in a single pass over the data, an index whose definition holds several values of key is in the bucket of each. Groups are ordered by first appearance of their value(s), nan values are not grouped. The data of each group are stacked once (see ``_stack_group_arrays``), a group of a single index keeps its arrays as they are.
 	
 	args:
-		current (dict): Dict of current definition, where value for each key is type=set
-		updater (dict): Dict of updater
+		data (ekpy.analysis.core.Data): The data to group
+		key (str or list of): Key(s) to group on. Multiple keys are grouped hierarchically.
 		
 	returns:
-		(dict)
-		
-	examples:
-		
-		.. code-block:: python 
+		(ekpy.analysis.core.Data)
+
+	"""
+	keys = list(key) if isinstance(key, (list, np.ndarray)) else [key]
+	_dict = data.to_dict()
+	summary_keys = data.summary.keys()
+	for key in keys:
+		assert key in summary_keys, 'key "{}" is not in definition. Available keys are "{}"'.format(key, summary_keys)
+
+	# bucket the indices by their value(s) of keys, ranks are the order of first appearance of each value per key
+	buckets = {}
+	ranks = [{} for key in keys]
+	for index, entry in _dict.items():
+		definition = entry['definition']
+		values = []
+		for key, rank in zip(keys, ranks):
+			if key not in definition:
+				raise KeyError(key)
+			key_values = [value for value in definition[key] if value == value] # drop nans
+			for value in key_values:
+				rank.setdefault(value, len(rank))
+			values.append(key_values)
+		for group in itertools.product(*values):
+			buckets.setdefault(group, []).append(index)
+
+	out = {}
+	for ijk, group in enumerate(sorted(buckets, key = lambda group: tuple(rank[value] for rank, value in zip(ranks, group)))):
+		_definition = {}
+		arrays = {}
+		for index in buckets[group]:
+			for defn_key, values in _dict[index]['definition'].items():
+				_definition.setdefault(defn_key, set()).update(values)
+			for data_key, values in _dict[index]['data'].items():
+				arrays.setdefault(data_key, []).append(values)
+		out.update({ijk:{'definition':_definition, 'data':{data_key:_stack_group_arrays(arrays[data_key]) for data_key in arrays}}})
 		
-			>>> current = {'param1':{'a'}, 'param2':{'a'}}
-			>>> updater = {'param1':{'a'}, 'param2':{'b'}}
-			>>> _update_definition_dict(current, updater)
-			> {'param1':{'a'}, 'param2':{'a', 'b'}}
+	return Data(out)
+
+def _stack_group_arrays(arrays):
+	"""Stack the arrays of a data key of the indices of a group (see ``_group_data``). The rows of 2D arrays (already grouped indices) and 1D arrays are stacked in a single 2D array, padded with nans (see ``_stack_arrays``). A single array is returned as is.
+
+	args:
+		arrays (list): Array of each index
+
+	returns:
+		(numpy.ndarray)
 	"""
-	
-	for key in updater:
+	if len(arrays) == 1:
+		return arrays[0]
+
+	rows = []
+	for array in arrays:
+		array = np.asarray(array)
+		if len(array.shape) == 2:
+			rows.extend(array)
+		else:
+			rows.append(array)
+	return _stack_arrays(rows) if len(rows) > 1 else np.asarray(rows)
+
+def _apply_to_data_dict(func, data_dict, defn, pass_defn, pass_trials_iteratively, ignore_coerce_warnings, kwargs):
+	"""Apply func to the data dict of one index, see ``Data.apply``.
+
+	returns:
+		(dict): new data dict
+	"""
+	if pass_defn:
+		#ensure no overlap between passed arguments and definition arguments:
+		overlap = set(kwargs.keys()).intersection(set(defn.keys()))
+		if len(overlap) != 0:
+			raise ValueError('There are matching function arguments passed in both definition and as kwargs in .apply(). Overlapping keys are "{}"'.format(overlap))
+
+		to_pass = defn.copy()
+		to_pass.update(kwargs)
+	else:
+		to_pass = kwargs
+
+	if not pass_trials_iteratively:
+		_func_out = func(data_dict, **to_pass)
+		if type(_func_out) is not dict:
+			raise TypeError('Function {} did not return dict.'.format(getattr(func, '__name__', repr(func))))
+		return _func_out
+
+	dabs = {}
+	for _dict in iterable_data_dict(data_dict):
+		_func_out = func(_dict, **to_pass)
+		for key in _func_out:
+			try:
+				dabs[key].append(_func_out[key])
+			except:
+				dabs.update({key:data_array_builder()})
+				dabs[key].append(_func_out[key])
+	out = {}
+	for key in dabs:
+		out.update({key:dabs[key].build(ignore_coerce_warnings=ignore_coerce_warnings)})
+	return out
+
+def _apply_by_index(data, func, pass_defn, pass_trials_iteratively, ignore_coerce_warnings, kwargs):
+	"""Apply func to each index of data, one at a time (see ``Data.apply``). Yields (index, definition, new data dict or the exception raised)."""
+	for index in data:
+		entry = data[index]
 		try:
-			current[key] = current[key].union(updater[key])
-		except KeyError:
-			current.update({key: updater[key]})
-			
-	return current
+			out = _apply_to_data_dict(func, entry['data'], entry['definition'], pass_defn, pass_trials_iteratively, ignore_coerce_warnings, kwargs)
+		except Exception as e:
+			out = e
+		yield index, entry['definition'], out
+
+def _batch_stacks(data_dict):
+	"""Return the arrays of data_dict as 2D (n_trials, n_samples) arrays, 1D arrays repeated for each trial as ``iterable_data_dict`` passes them. None if they cannot be stacked (not numpy arrays, not 1D or 2D, or 2D with different numbers of trials)."""
+	if len(data_dict) == 0:
+		return None
+	for value in data_dict.values():
+		if not isinstance(value, np.ndarray) or len(value.shape) not in (1, 2):
+			return None
+
+	ntrials = max(value.shape[0] if len(value.shape) == 2 else 1 for value in data_dict.values())
+	stacks = {}
+	for key, value in data_dict.items():
+		if len(value.shape) == 1:
+			value = np.repeat(value.reshape(1, -1), ntrials, axis = 0)
+		elif value.shape[0] != ntrials:
+			return None
+		stacks[key] = value
+	return stacks
+
+def _split_batch_output(out, ntrials):
+	"""Split the output of a batch capable function on the stacked trials of several indices (ntrials trials each). None if out does not have one row per trial. An index with a single trial gets 1D arrays, as in ``Data.apply`` trial by trial."""
+	total = sum(ntrials)
+	if type(out) is not dict:
+		return None
+	arrays = {}
+	for key, value in out.items():
+		if not isinstance(value, np.ndarray):
+			return None
+		if len(value.shape) == 1 and total == 1:
+			value = value.reshape(1, -1)
+		if len(value.shape) != 2 or value.shape[0] != total:
+			return None
+		arrays[key] = value
+
+	bounds = np.cumsum([0] + list(ntrials))
+	return [
+		{key:value[start] if stop - start == 1 else value[start:stop] for key, value in arrays.items()}
+		for start, stop in zip(bounds[:-1], bounds[1:])
+	]
+
+def _apply_batched(data, func, pass_defn, ignore_coerce_warnings, kwargs):
+	"""Apply batch capable func to the trials of data (see ``Data.apply(mode='batch')``). Indices whose arrays have the same keys, numbers of samples and dtypes are stacked and passed in one call (each index on its own if pass_defn). Indices which cannot be stacked, and batches which raise or do not return one row per trial, are applied trial by trial.
 
-def _update_data_dict(current:'dict <key,numpy.ndarray>', updater:'dict <key,numpy.ndarray>'):
-	"""Update `current` data dict, by union on keys with `updater`.
-	
-	args:
-		current (dict): Dict of current data, where value for each key is type=set
-		updater (dict): Dict of updater
-		
 	returns:
-		(dict)
-		
-	examples:
-		
-		.. code-block:: python 
-		
-			>>> current = {'time':array([0, 1, 2]), 'data':array([0, 0, 0])}
-			>>> updater = {'time':array([0, 1, 2]), 'data':array([1, 1, 1])}
-			>>> _update_data_dict(current, updater)
-			> {'time':array([[0, 1, 2],[0, 1, 2]]), 'data':array([[0, 0, 0], [1, 1, 1]])}
+		(list): (index, definition, new data dict or the exception raised) for each index of data, in order
 	"""
-	
-	for key in updater:
+	entries = [(index, data[index]) for index in data]
+	results = [None]*len(entries)
+	batches = {}
+	for position, (index, entry) in enumerate(entries):
+		stacks = _batch_stacks(entry['data'])
+		if stacks is None:
+			continue
+		signature = position if pass_defn else tuple((key, stack.shape[1], stack.dtype.str) for key, stack in stacks.items())
+		batches.setdefault(signature, []).append((position, stacks))
+
+	for batch in batches.values():
+		positions = [position for position, stacks in batch]
+		ntrials = [next(iter(stacks.values())).shape[0] for position, stacks in batch]
 		try:
-			
-			data_stack = current[key]
-			shape = data_stack.shape
-			if len(shape) == 1: # 1d data, one array
-				data_stack_df = pd.DataFrame(data_stack)
-			else: # case when multiple arrays already vstacked
-				data_stack_df = pd.DataFrame(data_stack).transpose()
-			
-			# going to use pandas to append all necessary nans (when arrays might have different shapes)
-			updated_data_stack_df = pd.concat((data_stack_df, pd.DataFrame(updater[key])), axis=1)
-			
-			current[key] = updated_data_stack_df.transpose().to_numpy()
-		except KeyError:
-			current.update({key: updater[key]})
-			
-	return current
+			to_pass = kwargs
+			if pass_defn:
+				defn = entries[positions[0]][1]['definition']
+				if len(set(kwargs.keys()).intersection(set(defn.keys()))) != 0:
+					raise ValueError('overlapping kwargs') # reported trial by trial below
+				to_pass = defn.copy()
+				to_pass.update(kwargs)
+			stacked = {key:np.concatenate([stacks[key] for position, stacks in batch]) if len(batch) > 1 else batch[0][1][key] for key in batch[0][1]}
+			outs = _split_batch_output(func(stacked, **to_pass), ntrials)
+		except Exception:
+			outs = None
+		if outs is not None:
+			for position, out in zip(positions, outs):
+				results[position] = out
+
+	out = []
+	for position, (index, entry) in enumerate(entries):
+		if results[position] is None:
+			try:
+				results[position] = _apply_to_data_dict(func, entry['data'], entry['definition'], pass_defn, True, ignore_coerce_warnings, kwargs)
+			except Exception as e:
+				results[position] = e
+		out.append((index, entry['definition'], results[position]))
+	return out
+
+def _import_shared_memory():
+	"""Return the ``multiprocessing.shared_memory`` module, None before Python 3.8 (arrays are then pickled to the workers)."""
+	try:
+		from multiprocessing import shared_memory
+	except ImportError:
+		return None
+	return shared_memory
+
+class _shared_array():
+	"""Location of an array in a shared memory block (see ``_share_entries``)."""
+
+	def __init__(self, offset, shape, dtype):
+		self.offset = offset
+		self.shape = shape
+		self.dtype = dtype
+
+	def view(self, buf):
+		"""Array in buf (the buffer of the shared memory block), without copy."""
+		return np.ndarray(self.shape, dtype = self.dtype, buffer = buf, offset = self.offset)
+
+def _share_entries(entries):
+	"""Copy the numeric arrays of the data of entries ({index:{'definition':dict, 'data':dict}}) to a single shared memory block, so process workers read them instead of receiving pickled copies.
 
-def _group_data(data:'ekpy.analysis.core.Data', key:'str'):
-	"""Group data by key. Similar to Dataset.get_data(groupby=key).get_data(), though offers one to perform functions on individual data files before grouping.
-	
-	args:
-		data (ekpy.analysis.core.Data): The data to group
-		key (str): Key to group on
-		
 	returns:
-		(ekpy.analysis.core.Data)
+		(tuple): (shared_memory.SharedMemory or None if there is nothing to share, {index:{'definition':dict, 'data':dict}} with the shared arrays replaced by their _shared_array)
+	"""
+	layouts, size = {}, 0
+	for index, entry in entries.items():
+		data = {}
+		for key, value in entry['data'].items():
+			if isinstance(value, np.ndarray) and not value.dtype.hasobject and value.size != 0:
+				# 64 byte aligned, so every view is aligned for its dtype
+				size = -(-size//64)*64
+				data[key] = _shared_array(size, value.shape, value.dtype)
+				size += value.nbytes
+			else:
+				data[key] = value
+		layouts[index] = {'definition':entry['definition'], 'data':data}
+	if size == 0:
+		return None, layouts
+
+	shm = _import_shared_memory().SharedMemory(create = True, size = size)
+	try:
+		for index, entry in entries.items():
+			for key, value in entry['data'].items():
+				location = layouts[index]['data'][key]
+				if isinstance(location, _shared_array):
+					location.view(shm.buf)[...] = value
+	except BaseException:
+		shm.close()
+		shm.unlink()
+		raise
+	return shm, layouts
+
+def _apply_chunk(data, func, mode, pass_defn, pass_trials_iteratively, ignore_coerce_warnings, kwargs):
+	"""Apply func to the indices of data (dict of entries) as ``Data.apply`` does in a single process.
 
+	returns:
+		(list): (index, definition, new data dict or the exception raised) for each index of data, in order
 	"""
-	_dict = {}
-	assert key in set(data.summary.keys()), 'key "{}" is not in definition. Available keys are "{}"'.format(key, data.summary.keys())
-	
-	possible_values = data.summary[key]
-	for ijk, val in enumerate(possible_values):
-		tdata = data.contains({key:[val]})
+	if mode == 'batch' and pass_trials_iteratively:
+		return _apply_batched(data, func, pass_defn, ignore_coerce_warnings, kwargs)
+	return list(_apply_by_index(data, func, pass_defn, pass_trials_iteratively, ignore_coerce_warnings, kwargs))
 
-		# group definitions
-		_definition = {}
-		_data = {}
-		for index in tdata:
-			_updater_definition = tdata.iloc[index].definition
-			_updater_data = tdata.iloc[index].data
-			_definition = _update_definition_dict(_definition, _updater_definition)
-			_data = _update_data_dict(_data, _updater_data)
-			
-		_dict.update({ijk:{'definition':_definition, 'data':_data}})
-		
-	return Data(_dict)
+def _apply_shared_chunk(name, layouts, func, mode, pass_defn, pass_trials_iteratively, ignore_coerce_warnings, kwargs):
+	"""``_apply_chunk`` in a process worker, on the arrays of layouts (see ``_share_entries``) in the shared memory block name. Output arrays which are views of the block are copied and exceptions are made picklable, so the results can be sent back."""
+	shm = _import_shared_memory().SharedMemory(name = name) if name is not None else None
+	try:
+		data = {
+			index:{
+				'definition':entry['definition'],
+				'data':{key:value.view(shm.buf) if isinstance(value, _shared_array) else value for key, value in entry['data'].items()}
+			}
+			for index, entry in layouts.items()
+		}
+		results = []
+		for index, defn, out in _apply_chunk(data, func, mode, pass_defn, pass_trials_iteratively, ignore_coerce_warnings, kwargs):
+			if isinstance(out, Exception):
+				out = _picklable_exception(out)
+			elif shm is not None:
+				block = np.frombuffer(shm.buf, dtype = np.uint8)
+				out = {key:value.copy() if isinstance(value, np.ndarray) and np.may_share_memory(value, block) else value for key, value in out.items()}
+				del block
+			results.append((index, defn, out))
+		del data
+		return results
+	finally:
+		if shm is not None:
+			try:
+				shm.close()
+			except BufferError:
+				# func kept a view of the block, the mapping is released with it
+				pass
+
+def _picklable_exception(e):
+	"""e without its traceback (which holds the arrays of the failed index), or a RuntimeError with its message if e cannot be pickled."""
+	e = e.with_traceback(None)
+	try:
+		pickle.loads(pickle.dumps(e))
+	except Exception:
+		return RuntimeError('{}: {}'.format(type(e).__name__, e))
+	return e
+
+def _apply_parallel(data, func, mode, pass_defn, pass_trials_iteratively, ignore_errors, ignore_coerce_warnings, kwargs, n_jobs, backend):
+	"""Apply func to the indices of data split in contiguous chunks across n_jobs workers of backend ('process' or 'thread'), see ``Data.apply``. Chunks are collected in order, so the output is the one of a single process. For the process backend, the arrays of a chunk are shared only while it is in flight (at most n_jobs + 1 chunks). Unless ignore_errors, chunks after the first error are cancelled.
+
+	returns:
+		(list): (index, definition, new data dict or the exception raised) for each index of data, in order (up to the first error unless ignore_errors)
+	"""
+	indices = list(data)
+	# a few chunks per worker, so a slow chunk does not leave the others idle
+	nchunks = min(len(indices), 4*n_jobs)
+	chunks = [{indices[i]:data[indices[i]] for i in chunk} for chunk in np.array_split(np.arange(len(indices)), nchunks)]
+
+	# before Python 3.8 there is no shared memory, the arrays are pickled to the workers
+	share = _import_shared_memory() is not None
+	# (future, shared memory block or None) of the chunks submitted and not yet collected
+	pending = deque()
+	try:
+		with _get_executor(backend, n_jobs) as executor:
+			results = []
+			try:
+				submitted = 0
+				while submitted < len(chunks) or pending:
+					# chunks are shared just before a worker can take them, so at most n_jobs + 1 blocks exist at a time
+					while submitted < len(chunks) and len(pending) <= n_jobs:
+						chunk = chunks[submitted]
+						submitted += 1
+						if backend == 'process':
+							shm, layouts = _share_entries(chunk) if share else (None, chunk)
+							pending.append((executor.submit(_apply_shared_chunk, shm.name if shm is not None else None, layouts, func, mode, pass_defn, pass_trials_iteratively, ignore_coerce_warnings, kwargs), shm))
+						else:
+							pending.append((executor.submit(_apply_chunk, chunk, func, mode, pass_defn, pass_trials_iteratively, ignore_coerce_warnings, kwargs), None))
+
+					future, shm = pending.popleft()
+					try:
+						chunk_results = future.result()
+					finally:
+						if shm is not None:
+							shm.close()
+							shm.unlink()
+					for result in chunk_results:
+						results.append(result)
+						if not ignore_errors and isinstance(result[2], Exception):
+							return results
+			finally:
+				for future, shm in pending:
+					future.cancel()
+		return results
+	finally:
+		# blocks of the chunks left at an error, released once the workers are done with them
+		for future, shm in pending:
+			if shm is not None:
+				shm.close()
+				shm.unlink()
 
 def _drop_data_dict_nans(data_dict):
 	"""Drop nans in data_dict
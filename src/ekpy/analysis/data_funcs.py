@@ -1,7 +1,37 @@
 import numpy as np
 import warnings
+import functools
+
+__all__ = ('iterable_data_array', 'iterable_data_dict','data_array_builder', 'not_nan_indexer', 'batch_capable')
+
+def batch_capable(func):
+	"""Decorator declaring a function on data batch capable, for ``Data.apply(..., mode='batch')``. A batch capable function treats each row (trial) of the 2D arrays of data_dict on its own and returns a dict of arrays with one row per row of the input, as the data funcs built with ``iterable_data_array`` and ``data_array_builder`` do. Such a function is called once on the stacked trials of many indices instead of once per trial.
+
+	args:
+		func (function): f(data_dict, **kwargs) -> dict
+
+	returns:
+		(function): func, marked batch capable
+
+	examples:
+
+		.. code-block:: python
+
+			>>> @batch_capable
+			... def subtract_offset(data_dict):
+			... 	return {'x':data_dict['x'] - np.mean(data_dict['x'], axis = -1, keepdims = True)}
+
+			>>> data.apply(subtract_offset, mode = 'batch')
+	"""
+	func.batch_capable = True
+	return func
+
+def _is_batch_capable(func):
+	"""Whether func was declared with ``batch_capable``. A ``functools.partial`` of a batch capable function is batch capable."""
+	while isinstance(func, functools.partial):
+		func = func.func
+	return getattr(func, 'batch_capable', False) is True
 
-__all__ = ('iterable_data_array', 'iterable_data_dict','data_array_builder', 'not_nan_indexer')
 
 class iterable_data_dict():
 	
@@ -249,18 +279,19 @@ class data_array_builder(list):
 			if len(thing)>target_length:
 				target_length = len(thing)
 
+		things = []
 		for thing in self:
 			if convert_to_ndarray:
 				thing = np.array([thing]).flatten()
 			# get thing into target shape
-			while len(thing) != target_length:
-				thing = np.concatenate((thing, np.array([np.nan])))
-			try:
-				out = np.vstack((out, thing))
-			except NameError:
-				out = thing.copy()
-
-		return out
+			if len(thing) != target_length:
+				thing = np.concatenate((thing, np.full(target_length - len(thing), np.nan)))
+			things.append(thing)
+
+		# stack once, stacking one at a time is quadratic in the number of things
+		if len(things) == 1:
+			return things[0].copy()
+		return np.vstack(things)
 
 
 def _fod_dimensionality_fixer(data_dict, check_key, keys_to_fix):
@@ -6,63 +6,184 @@ import warnings
 import pickle
 import ast
 
-from .core import Dataset, Data
-from ..utils import read_ekpy_data
+from .core import Dataset, Data, _path_codes, _check_parallel, _get_executor
+from .cache import _list_directory
+from ._ekpds import _is_ekpds_v2, _read_ekpds
+from ._ekpdat import _is_ekpdat_v2, _read_ekpdat
+from ..utils import read_ekpy_data, MetaDataCatalog, CATALOG_FILENAME, migrate_meta_data
 
-__all__ = ('load_Dataset', 'generate_meta_data', 'read_ekpds', 'read_ekpdat')
+__all__ = ('load_Dataset', 'load_catalog', 'generate_meta_data', 'read_ekpds', 'read_ekpdat')
 
-def load_Dataset(path, meta_data=None, readfileby=read_ekpy_data):
+def load_Dataset(path, meta_data=None, readfileby=read_ekpy_data, verify_files=True, where=None, params=(), catalog=None):
 	"""
-	Load a dataset from path. Path must contain (pickle or .csv) file ``'meta_data'``. 
+	Load a dataset from path. Path must contain (pickle or .csv) file ``'meta_data'``, or a catalog of meta data (``ekpy.utils.MetaDataCatalog``, see ``ekpy.utils.migrate_meta_data``). If path has both, the catalog is used.
 
 	args:
 		path (str): Path to data
 		meta_data (pandas.DataFrame): meta_data if one wishes to provide different meta_data from that provided in path. 
 		readfileby (callable): Method for reading data. 
+		verify_files (bool): Remove rows of meta_data whose file does not exist in path (see ``Dataset.remove_nonexistent_files_from_metadata``). Pass False to skip the check for meta_data known to be up to date.
+		where (str or None): Only load rows satisfying where, an SQL expression evaluated by the catalog (see ``ekpy.utils.MetaDataCatalog.query``). Requires a catalog.
+		params (tuple or dict): Values of the placeholders in where
+		catalog (str, MetaDataCatalog or None): Catalog with the meta data of path, *e.g.* one shared by several directories. None uses the catalog in path (``ekpy.utils.CATALOG_FILENAME``), if any.
 
 	returns: 
 		(Dataset): Dataset 
+
+	examples:
+
+		.. code-block:: python
+
+			>>> dset = load_Dataset(path, where='high_voltage_v > ? AND trial = 0', params=(0.5,))
+
 	"""
-	files = list(os.listdir(path))
-	existing_ekpds = []
-	for file in files:
-		if '.ekpds' in file:
-			existing_ekpds.append(file)
+	existing_ekpds = sorted(file for file in _list_directory(path) if '.ekpds' in file)
 
 	if len(existing_ekpds) != 0:
 		warnings.showwarning('There exist .ekpds files ({}) in this directory. If you want to load those Datasets, be sure to use ``.read_ekpds``'.format(existing_ekpds), UserWarning, '', 0)
 
-	return Dataset(path, _build_df(path, meta_data), readfileby=readfileby).remove_nonexistent_files_from_metadata()
+	if meta_data is None:
+		catalog = _find_catalog(path, catalog)
+	elif where is not None or catalog is not None:
+		raise ValueError('where and catalog cannot be used with meta_data.')
+	if catalog is not None:
+		meta_data, paths = catalog.query(where, params, path = path)
+	elif where is not None:
+		raise FileNotFoundError('where requires a catalog, but path "{}" has none. Create one with ``ekpy.utils.migrate_meta_data``'.format(path))
+
+	dset = Dataset(path, _build_df(path, meta_data), readfileby=readfileby)
+	if not verify_files:
+		return dset
+	return dset.remove_nonexistent_files_from_metadata()
+
 
+def load_catalog(catalog, where=None, params=(), readfileby=read_ekpy_data, verify_files=True):
+	"""
+	Load a Dataset from the rows of a catalog of meta data (``ekpy.utils.MetaDataCatalog``) satisfying where. The rows may be of several data directories.
+
+	args:
+		catalog (str or MetaDataCatalog): Catalog
+		where (str or None): SQL expression evaluated by the catalog (see ``ekpy.utils.MetaDataCatalog.query``). None loads all rows.
+		params (tuple or dict): Values of the placeholders in where
+		readfileby (callable): Method for reading data. 
+		verify_files (bool): Remove rows of meta data whose file does not exist (see ``Dataset.remove_nonexistent_files_from_metadata``)
 
-def read_ekpdat(filename):
+	returns:
+		(Dataset): Dataset
+
+	examples:
+
+		.. code-block:: python
+
+			>>> dset = load_catalog('./all_data/meta_data.sqlite', where='identifier = "185um"')
+
+	"""
+	if not isinstance(catalog, MetaDataCatalog):
+		catalog = MetaDataCatalog(_existing_file(catalog))
+	meta_data, paths = catalog.query(where, params)
+
+	codes, directories = pd.factorize(paths)
+	dset = Dataset(_path_codes(np.asarray(directories, dtype = object), codes), meta_data, readfileby=readfileby)
+	if not verify_files:
+		return dset
+	return dset.remove_nonexistent_files_from_metadata()
+
+def _find_catalog(path, catalog):
+	"""Return the catalog of path (MetaDataCatalog) or None if there is none."""
+	if isinstance(catalog, MetaDataCatalog):
+		return catalog
+	if catalog is not None:
+		return MetaDataCatalog(_existing_file(catalog))
+	if CATALOG_FILENAME in _list_directory(path):
+		return MetaDataCatalog(os.path.join(path, CATALOG_FILENAME))
+	return None
+
+def _existing_file(filename):
+	# MetaDataCatalog creates missing catalogs, which is never intended when loading
+	if not os.path.isfile(filename):
+		raise FileNotFoundError('No catalog {}'.format(filename))
+	return filename
+
+def read_ekpdat(filename, indices=None, mmap_mode=None, lazy=False):
 	"""Read Data from `.ekpdat` file.
 
 	args:
 		filename (str): Path to file
+		indices (array-like or None): Data indices to read. None reads all.
+		mmap_mode (str or None): 'r' or 'c' memory-map the arrays (see ``numpy.memmap``) instead of reading them. The file stays open until the arrays are garbage collected.
+		lazy (bool): Read the arrays of an index the first time its data is accessed. Definitions are read immediately.
 
 	returns:
 		(Data): Data
+
+	examples:
+
+		.. code-block:: python
+
+			>>> data = read_ekpdat('./processed.ekpdat', indices=[0, 5]) # reads only indices 0 and 5
+			>>> data = read_ekpdat('./processed.ekpdat', mmap_mode='r') # no array is read until used
+
 	"""
+	if mmap_mode not in (None, 'r', 'c'):
+		raise ValueError('mmap_mode must be None, "r" or "c". Got {}'.format(mmap_mode))
 	with open(filename, 'rb') as f:
-		_dict = pickle.load(f)
-
+		is_v2 = _is_ekpdat_v2(f)
+		if not is_v2:
+			# files written before version 2 are a pickled dict
+			_dict = pickle.load(f)
+	if is_v2:
+		return Data(_read_ekpdat(filename, indices=indices, mmap_mode=mmap_mode, lazy=lazy))
+
+	if indices is not None:
+		missing = [key for key in indices if key not in _dict]
+		if len(missing) != 0:
+			raise KeyError('indices {} not in {}. Available indices are {}'.format(missing, filename, list(_dict)))
+		_dict = {key:_dict[key] for key in indices}
 	return Data(_dict)
 
-def read_ekpds(filename):
+def read_ekpds(filename, readfileby=None, meta_data_only=False):
 	"""Read a Dataset from `.ekpds` file.
 
 	args:
 		filename (str): Path to file
+		readfileby (callable or None): Method for reading data. None uses the readfileby stored in the file (unpickled), or ``read_ekpy_data`` if none is stored. Pass readfileby to not unpickle the stored one.
+		meta_data_only (bool): Only read the meta data
 
 	returns:
-		(Dataset): Dataset
+		(Dataset or pandas.DataFrame): Dataset, or its meta data if meta_data_only
 
-	"""
+	examples:
 
+		.. code-block:: python
+
+			>>> dset = read_ekpds('./dset1.ekpds')
+			>>> meta_data = read_ekpds('./dset1.ekpds', meta_data_only=True) # does not unpickle readfileby
+
+	"""
+	load_readfileby = readfileby is None and not meta_data_only
 	with open(filename, 'rb') as f:
-		out = f.read()
+		if _is_ekpds_v2(f):
+			meta_data, paths, path_codes, pointercolumn, stored_readfileby = _read_ekpds(f, load_readfileby)
+			path = _path_codes(paths, path_codes)
+		else:
+			meta_data, path, pointercolumn, stored_readfileby = _read_legacy_ekpds(f.read(), load_readfileby)
+
+	if meta_data_only:
+		return meta_data
+	if readfileby is None:
+		readfileby = stored_readfileby if stored_readfileby is not None else read_ekpy_data
+	return Dataset(path, meta_data, readfileby, pointercolumn=pointercolumn)
+
+def _read_legacy_ekpds(out, load_readfileby=True):
+	"""Read .ekpds file written before version 2: a pickled preamble, readfileby and meta data, separated by delimiters.
 
+	args:
+		out (bytes): Content of the file
+		load_readfileby (bool): Unpickle readfileby
+
+	returns:
+		(pandas.DataFrame, dict, str, function or None): meta data, path, pointercolumn, readfileby
+	"""
 	_location1 = out.find(b'########') #up to here is preamble, after is readfileby
 	preamble = pickle.loads(out[:_location1])
 	preamble_spl = preamble.split('|')
@@ -83,11 +204,11 @@ def read_ekpds(filename):
 	path = ast.literal_eval(y.split('path:')[-1])
 	preamble_dict.update({'path':path})
 
-	readfileby = pickle.loads(out[_location1+8:])
+	readfileby = pickle.loads(out[_location1+8:]) if load_readfileby else None
 	_location2 = out.find(b'##|##|##|##') #after this is dset
 	meta_data = pickle.loads(out[_location2+11:])
 	
-	return Dataset(preamble_dict['path'], pd.DataFrame(meta_data), readfileby, pointercolumn=preamble_dict['pointercolumn'])
+	return pd.DataFrame(meta_data), preamble_dict['path'], preamble_dict['pointercolumn'], readfileby
 
 def _build_df(path, meta_data):
 
@@ -102,7 +223,7 @@ def _build_df(path, meta_data):
 	else:
 		return meta_data
 
-def generate_meta_data(path, mapper:'f(str)->dict', pass_path=False, pointercolumn='filename', overwrite=False, ignore_errors=True):
+def generate_meta_data(path, mapper:'f(str)->dict', pass_path=False, pointercolumn='filename', overwrite=False, ignore_errors=True, incremental=False, parallel=False, max_workers=None):
 	"""
 	Generate meta_data from a path for a given mapper function. **Important** mapper must include pointercolumn which is `(key,value) = ('<pointer column name>', <filename>)`. Default is to call such a column `filename`, i.e. `{'filename':'a.csv'}`
 
@@ -113,6 +234,9 @@ def generate_meta_data(path, mapper:'f(str)->dict', pass_path=False, pointercolu
 		pointercolumn (str) : The name of the pointercolumn in the created meta_data
 		overwrite (bool) : True will overwrite any existing meta_data in path. 
 		ignore_errors (bool) : False will hault generation of meta data if a single file fails. Default is True (ignore)
+		incremental (bool) : Only map files that are not in the existing meta data of path (by pointercolumn) and append them to it, instead of recreating it. If path has a catalog (see ``ekpy.utils.MetaDataCatalog``) the new rows are appended to the catalog. Otherwise meta_data.csv is recreated, and so are the rows of path in its catalog if it has one.
+		parallel (bool or str) : Map files in parallel. True or 'thread' uses a thread pool, 'process' uses a process pool (useful for mappers which parse the files, *e.g.* with pass_path=True; mapper must then be picklable, *i.e.* defined at module level). Default False maps serially.
+		max_workers (int or None) : Maximum number of workers when mapping in parallel. None uses the ``concurrent.futures`` default.
 
 
 	examples:
@@ -154,40 +278,115 @@ def generate_meta_data(path, mapper:'f(str)->dict', pass_path=False, pointercolu
 
 			generate_meta_data(path, mapper, pass_path=True)
 
+
+		Parse only files added since meta data was last generated, in a process pool:
+
+		.. code-block:: python
+
+			from ekpy.analysis import radiant
+
+			generate_meta_data(path, radiant.generic_mapper, pass_path=True, incremental=True, parallel='process')
+
 	"""
-	if 'meta_data.csv' in set(os.listdir(path)):
-		if not overwrite:
-			yn = input('this path ({}) already has meta_data.csv, do you wish to recreate it? (y/n)'.format(path))
+	_check_parallel(parallel)
+	meta_data_file = os.path.join(path, 'meta_data.csv')
+	# the meta data itself is not a data file
+	files = [file for file in os.listdir(path) if file not in ('meta_data.csv', 'meta_data', CATALOG_FILENAME)]
+
+	catalog, existing_meta_data = None, None
+	if incremental:
+		catalog = _find_catalog(path, None)
+		if catalog is not None:
+			existing_meta_data, paths = catalog.query(path = path, columns = [pointercolumn] if pointercolumn in catalog.columns else [])
+		else:
+			try:
+				existing_meta_data = _build_df(path, None)
+			except FileNotFoundError:
+				pass
+		if existing_meta_data is not None:
+			if pointercolumn not in existing_meta_data.columns:
+				# every file would be mapped and appended again
+				raise ValueError('incremental requires the existing meta data of path "{}" to have pointercolumn "{}". Use incremental=False (and overwrite=True) to recreate it.'.format(path, pointercolumn))
+			existing_files = set(existing_meta_data[pointercolumn].values)
+			files = [file for file in files if file not in existing_files]
+
+	else:
+		catalog = _find_catalog(path, None)
+		if not overwrite and (os.path.isfile(meta_data_file) or catalog is not None):
+			yn = input('this path ({}) already has meta data, do you wish to recreate it? (y/n)'.format(path))
 			if yn.lower() != 'y':
 				print('skipping. NOT overwriting.')
 				return
 			else:
 				print('overwriting.')
 
-	for file in os.listdir(path):
-		try:
-			if pass_path:
-				# used to open the file to read meta data
-				meta_data = pd.DataFrame(mapper(file, path=path), index=[0])
-			else:
-				# does not open file
-				meta_data = pd.DataFrame(mapper(file), index=[0])
-		except Exception as e:
-			if ignore_errors:
-				# don't error if unable to process one file.
-				print('unable to process file: {} \nError: {}'.format(file, e))
-				continue
-			else:
-				raise e
-		try:
-			existing_meta_data = pd.concat([existing_meta_data, meta_data], ignore_index=True)
-		except NameError:
-			existing_meta_data = meta_data.copy()
-
-	if pointercolumn not in set(existing_meta_data.columns): 
-		warnings.showwarning('there is no map to key "{}" in mapping function "{}" provided\nEnsure self.pointercolumn property has been set appropriately or else you will be unable to retrieve data'.format(pointercolumn, mapper.__name__), SyntaxWarning, '', 0,)
+	executor, futures = None, []
+	if not parallel:
+		results = (_map_file(file, mapper, path, pass_path) for file in files)
+	else:
+		executor = _get_executor(parallel, max_workers)
+		# send files to the workers in chunks, there may be many small tasks
+		workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+		chunksize = max(1, len(files)//(4*workers))
+		futures = [executor.submit(_map_files, files[i:i+chunksize], mapper, path, pass_path) for i in range(0, len(files), chunksize)]
+		results = (result for future in futures for result in future.result())
+
+	new_meta_data = []
+	try:
+		for file, (meta_data, error) in zip(files, results):
+			if error is not None:
+				if ignore_errors:
+					# don't error if unable to process one file.
+					print('unable to process file: {} \nError: {}'.format(file, error))
+					continue
+				else:
+					raise error
+			new_meta_data.append(meta_data)
+	finally:
+		if executor is not None:
+			# chunks not started yet are not mapped after an error
+			for future in futures:
+				future.cancel()
+			executor.shutdown()
+
+	if len(new_meta_data) == 0:
+		if incremental and existing_meta_data is not None:
+			print('no new files in "{}"'.format(path))
+			return
+		raise ValueError('no meta data was generated for the files in path "{}"'.format(path))
+	new_meta_data = pd.concat(new_meta_data, ignore_index=True)
+
+	if pointercolumn not in set(new_meta_data.columns): 
+		warnings.showwarning('there is no map to key "{}" in mapping function "{}" provided\nEnsure self.pointercolumn property has been set appropriately or else you will be unable to retrieve data'.format(pointercolumn, getattr(mapper, '__name__', mapper)), SyntaxWarning, '', 0,)
+
+	if incremental and catalog is not None:
+		catalog.append(new_meta_data, path)
+		print('{} rows appended to "{}"'.format(len(new_meta_data), catalog.filename))
+		return
+
+	if incremental and existing_meta_data is not None:
+		new_meta_data = pd.concat([existing_meta_data, new_meta_data], ignore_index=True)
 
 	# new 
-	existing_meta_data.to_csv(path+'meta_data.csv', index=False)
+	new_meta_data.to_csv(meta_data_file, index=False)
 	print('meta_data.csv saved to "{}"'.format(path))
+	if catalog is not None:
+		# load_Dataset reads the catalog of path, not meta_data.csv
+		migrate_meta_data(path, catalog, overwrite=True)
+		print('rows of "{}" rebuilt in "{}"'.format(path, catalog.filename))
 	return
+
+def _map_files(files, mapper, path, pass_path):
+	"""Return ``_map_file`` for each of files."""
+	return [_map_file(file, mapper, path, pass_path) for file in files]
+
+def _map_file(file, mapper, path, pass_path):
+	"""Return the meta data of file (``pandas.DataFrame``, one row) and None, or None and the error raised by mapper."""
+	try:
+		if pass_path:
+			# used to open the file to read meta data
+			return pd.DataFrame(mapper(file, path=path), index=[0]), None
+		# does not open file
+		return pd.DataFrame(mapper(file), index=[0]), None
+	except Exception as e:
+		return None, e
@@ -1,4 +1,4 @@
-from ..functions_on_data import iterable_data_array, data_array_builder
+from ..data_funcs import iterable_data_array, data_array_builder, batch_capable
 
 import pandas as pd
 import numpy as np
@@ -6,6 +6,7 @@ from scipy.optimize import curve_fit
 
 __all__ = ('window', 'fit_sine', 'center_yaxis', 'shift', 'scale', 'invert', 'average_over_same_angle')
 
+@batch_capable
 def window(data_dict, key = 'Y', window_size = 5, interval = [0,270]):
 	"""
 	Window the data by angle (i.e., 'Measured Angle (deg)') as specifed by key. 
@@ -46,6 +47,7 @@ def window(data_dict, key = 'Y', window_size = 5, interval = [0,270]):
 		
 	return {'angle':angle.build(), key:voltage.build()}
 
+@batch_capable
 def center_yaxis(data_dict, key = 'Y',top_percentile = 90, bottom_percentile = 'symmetric'):
 	"""
 	Center the data specified by key to ~zero. This operates by subtracting the mean(top_percentile(data), bottom_percentile(data)) from each data point. It is recommended you use symmetric top and bottom percentiles, (i.e., 90, 10 or 80, 20) though is not required.
@@ -76,6 +78,7 @@ def center_yaxis(data_dict, key = 'Y',top_percentile = 90, bottom_percentile = '
 	to_return.update({key:out.build()})
 	return to_return
 
+@batch_capable
 def fit_sine(data_dict, anglekey = 'angle', key = 'Y', periodicity = 1, units = 'degrees'):
 	"""
 	Fit data to sine wave with specified periodicity. 
@@ -120,6 +123,7 @@ def fit_sine(data_dict, anglekey = 'angle', key = 'Y', periodicity = 1, units =
 		
 	return {'params':out_params.build(), 'fakex':out_fake_angle.build(), 'simulated':out_simulation.build()}
 
+@batch_capable
 def shift(data_dict, shift_amnt, key):
 	"""
 	Shift the data by a constant amount. 
@@ -143,6 +147,7 @@ def shift(data_dict, shift_amnt, key):
 	out_dict.update({key:out.build()})
 	return out_dict
 
+@batch_capable
 def scale(data_dict, scale_amnt, key):
 	"""
 	Scale the data by a constant amount. 
@@ -166,6 +171,7 @@ def scale(data_dict, scale_amnt, key):
 	out_dict.update({key:out.build()})
 	return out_dict
 
+@batch_capable
 def invert(data_dict, key):
 	"""
 	Invert the data specified by key. 
@@ -188,6 +194,7 @@ def invert(data_dict, key):
 	out_dict.update({key:out.build()})
 	return out_dict
 
+@batch_capable
 def average_over_same_angle(data_dict, key, centers_every = 10, tolerance = 2, ignore_first_n = 100, ignore_end_n = 0):
 	"""
 	Average data specified by key at angles (key must be 'Measured Angle (deg)') specified by centers. This is typically used if you are dwelling at each angle from a specified set of angles for a long period of time in the measurement.
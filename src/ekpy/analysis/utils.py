@@ -4,7 +4,7 @@ import numpy as np
 import warnings
 
 from .core import Dataset, Data
-from .core import _convert_ITP_to_path_to_index
+from .core import _path_codes, _merge_datadefinition_dicts, _remove_nans_from_set
 
 __all__ = ('merge_Datasets', 'merge_Datas', 'concat_Datas', 'concat_Datasets')
 
@@ -82,7 +82,11 @@ def merge_Datas(tpl, by:str):
 								'param2': {'this will be its own index'}}}}
 	
 	"""
-	by_options = concat_Datas(tpl).summary[by]
+	# values of by in any Data, from the definition index of each
+	summaries = [dat.summary for dat in tpl]
+	if not any(by in summary for summary in summaries):
+		raise KeyError(by)
+	by_options = _remove_nans_from_set(set().union(*[summary.get(by, set()) for summary in summaries]))
 	
 	out_dict = dict()
 	
@@ -109,40 +113,58 @@ def merge_Datas(tpl, by:str):
 def merge_Datasets(datasets):
 	raise NameError('merge_Datasets was deprecated following version 0.1.4. Use "concat_Datasets" instead! (It has the exact some functionality)')
 
-def concat_Datasets(datasets):
-	"""Concatenate datasets.
+def concat_Datasets(datasets, union_columns=False):
+	"""Concatenate datasets. Columns are aligned by name.
 
 	args:
 		datasets (iter of Dataset): Iterable of Dataset objects to merge.
+		union_columns (bool): Allow datasets with different columns. The result has every column of any dataset, missing values are filled with nan. If False (default), raise ValueError if the columns differ.
 
 	returns:
 		(Dataset): Concatenated dataset.
 
+	examples:
+
+		.. code-block:: python
+
+			>>> days = [load_Dataset(path) for path in sorted(glob.glob('./data/2021-*/'))]
+			>>> dset = concat_Datasets(days)
+
 	"""
 	
 	if not hasattr(datasets, '__iter__'):
 		raise TypeError('datasets is not iterable.')
+	datasets = list(datasets)
+	if len(datasets) == 0:
+		raise ValueError('no datasets to concatenate.')
 
 	readfileby = datasets[0].readfileby
 	for dset in datasets[1:]:
 		if dset.readfileby != readfileby:
 			raise ValueError('not all datasets have the same function for readfileby. Ensure they agree and try again.')
 		
-	columns = datasets[0].columns
-	for dset in datasets[1:]:
-		if len(columns) != len(dset.meta_data.columns):
-			raise ValueError('supplied datasets do not all have the same columns!')
-		if (columns != dset.meta_data.columns).all():
-			raise ValueError('supplied datasets do not all have the same columns!')
-	
-	for i, dset in enumerate(datasets):
-		if i == 0:
-			new_path = dset.index_to_path
-			new_df = pd.DataFrame(dset.meta_data)
-		else:
-			new_path = pd.concat((new_path, dset.index_to_path), ignore_index = True)
-			new_df = pd.concat((new_df, pd.DataFrame(dset.meta_data)), ignore_index = True)
-			
-	path = _convert_ITP_to_path_to_index(new_path)
+	if not union_columns:
+		columns = datasets[0].columns
+		for dset in datasets[1:]:
+			if not dset.columns.equals(columns) and set(dset.columns) != set(columns):
+				raise ValueError('supplied datasets do not all have the same columns! {} != {}. Use union_columns=True to concatenate them anyway.'.format(list(columns), list(dset.columns)))
+
+	pointercolumns = {dset.pointercolumn for dset in datasets}
+	pointercolumn = datasets[0].pointercolumn if len(pointercolumns) == 1 else 'filename'
+
+	new_df = pd.concat([dset.meta_data for dset in datasets], ignore_index = True, sort = False)
+
+	# paths of every dataset, and the path code of each row offset to them
+	paths = np.concatenate([dset.attrs['paths'] for dset in datasets]) if len(new_df) != 0 else np.array([], dtype = object)
+	offsets = np.cumsum([0] + [len(dset.attrs['paths']) for dset in datasets[:-1]])
+	codes = np.concatenate([
+		np.where(dset.attrs['path_codes'] >= 0, dset.attrs['path_codes'] + offset, -1) 
+		for dset, offset in zip(datasets, offsets)
+	]) if len(new_df) != 0 else np.array([], dtype = np.int64)
+
+	# the same path in several datasets is stored once
+	inverse, unique_paths = pd.factorize(paths)
+	if len(unique_paths) != 0:
+		codes = np.where(codes >= 0, inverse[codes], -1)
 	
-	return Dataset(path,new_df,readfileby=readfileby)
\ No newline at end of file
+	return Dataset(_path_codes(np.asarray(unique_paths, dtype = object), codes), new_df, readfileby=readfileby, pointercolumn=pointercolumn)
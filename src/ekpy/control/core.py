@@ -8,7 +8,7 @@ import os
 from IPython import display
 
 from .misc import get_save_name
-from ..utils import write_ekpy_data
+from ..utils import write_ekpy_data, BINARY_EXTENSION, MetaDataCatalog, CATALOG_FILENAME, migrate_meta_data
 from ..utils.save import _create_target_dir
 
 __all__ = ('trial','experiment')
@@ -339,7 +339,7 @@ class experiment():
 		raise NotImplementedError('_plot() should be overridden in experiment subclass. It is not.')
 
 
-	def n_param_scan(self, kw_scan_params, fixed_params, scan_param_order, ntrials=1, print_progress=True, plot=False):
+	def n_param_scan(self, kw_scan_params, fixed_params, scan_param_order, ntrials=1, print_progress=True, plot=False, binary=False, catalog=False):
 		"""Perform a measurement over a set of params and save the data/meta data. 
 
 		args:
@@ -348,6 +348,8 @@ class experiment():
 			scan_param_order (array-like): Order of scan parameters. 
 			ntrials (int): Number of trials to perform.
 			plot (bool): Plot as data is collected.
+			binary (bool): Save data in the binary ekpy format (see ``ekpy.utils.write_ekpy_data``) instead of csv.
+			catalog (bool, str or MetaDataCatalog): Append meta data to a catalog instead of rewriting meta_data.csv (see ``trial``).
 
 
 		Examples:
@@ -422,7 +424,7 @@ class experiment():
 					iteration += 1
 					print('Scan {} of {}. {}'.format(iteration, total_scans, current_scan_params))
 					
-					trial_df = trial(self.run_function, kwargs, self.path, return_df=True)
+					trial_df = trial(self.run_function, kwargs, self.path, return_df=True, binary=binary, catalog=catalog)
 					if plot:
 						self._plot(trial_df, kwargs)
 					else:
@@ -439,7 +441,7 @@ class experiment():
 			print('done.')
 		
 
-def trial(run_function, run_function_args, path, return_df=False, save_meta_data_pickle=True):
+def trial(run_function, run_function_args, path, return_df=False, save_meta_data_pickle=True, binary=False, catalog=False):
 	"""
 	A trial for an experiment. This will save each trial (as csv) to path with a unique name (indexed by trial if an identical basename already exists). Also creates and saves meta data to path. The specified run_function must return ((str) base_name, (dict) meta_data, (pandas.dataframe) data).
 
@@ -452,21 +454,29 @@ def trial(run_function, run_function_args, path, return_df=False, save_meta_data
 		path (str): Save location.
 		return_df (bool): Return the resulting data (pandas.DataFrame)
 		save_meta_data_csv (bool): Save the meta_data as a pickle file in addition to .csv. This is carry over from a legacy version.
+		binary (bool): Save the data in the binary ekpy format (extension .ekb, see ``ekpy.utils.write_ekpy_data``) instead of csv. If the data cannot be written as binary (e.g. it has string columns) it is saved as csv.
+		catalog (bool, str or MetaDataCatalog): Append the meta data to a catalog (``ekpy.utils.MetaDataCatalog``) instead of rewriting meta_data.csv, which gets slow as meta data grows. True for the catalog of path (``ekpy.utils.CATALOG_FILENAME``), or a (shared) catalog. If the catalog has no rows of path yet, an existing meta_data.csv is migrated to it first. save_meta_data_pickle is ignored. If path already has a catalog, it is appended to even if catalog is False, as ``load_Dataset`` reads only the catalog of such a path.
 	
 
 
 	"""
 	base_name, meta_data, df = run_function(**run_function_args)
-	try:
-		existing_meta_data = pd.read_csv(os.path.join(path, 'meta_data.csv'))
-	except FileNotFoundError:
-		existing_meta_data = None
+	catalog = _trial_catalog(path, catalog)
+	existing_meta_data = None
+	if catalog is None:
+		try:
+			existing_meta_data = pd.read_csv(os.path.join(path, 'meta_data.csv'))
+		except FileNotFoundError:
+			pass
 
 	try:
 		save_name = get_save_name(base_name, path)
 		try: # attempt to get the trial number by looking at meta data, if any issues arise, increment the base_name by one and use that as trial number
-			query_str = _generate_meta_data_query_str(meta_data)
-			trial = _get_trial_number(existing_meta_data, query_str)
+			if catalog is None:
+				query_str = _generate_meta_data_query_str(meta_data)
+				trial = _get_trial_number(existing_meta_data, query_str)
+			else:
+				trial = _get_catalog_trial_number(catalog, meta_data, path)
 
 		except: # revert to old way of doing
 			trial = int(save_name.split('_')[-1].replace('.csv',''))
@@ -478,14 +488,34 @@ def trial(run_function, run_function_args, path, return_df=False, save_meta_data
 
 	assert type(df) == type(pd.DataFrame()), 'run_function {} does not return a pandas.DataFrame as its third return argument, it must'.format(run_function.__name__)
 
-	try:
-		write_ekpy_data(os.path.join(path,save_name), df, meta_data)
-	except:
-		# fall back to to_csv
-		df.to_csv(os.path.join(path,save_name), index=False)
+	if binary:
+		binary_save_name = os.path.splitext(save_name)[0] + BINARY_EXTENSION
+		meta_data.update({'filename':binary_save_name})
+		try:
+			write_ekpy_data(os.path.join(path,binary_save_name), df, meta_data, binary=True)
+		except (TypeError, ValueError) as e:
+			warnings.warn('could not save binary ekpy data ({}). Saving as csv instead.'.format(e))
+			meta_data.update({'filename':save_name})
+			binary = False
+
+	if not binary:
+		try:
+			write_ekpy_data(os.path.join(path,save_name), df, meta_data)
+		except:
+			# fall back to to_csv
+			df.to_csv(os.path.join(path,save_name), index=False)
 
 	#update the meta_data file in this directory
 	meta_data = pd.DataFrame(meta_data, index = [0])
+	if catalog is not None:
+		existing_columns = catalog.columns_of(path)
+		if len(existing_columns) != 0 and set(meta_data.columns) != set(existing_columns):
+			raise ValueError('the columns of meta_data do not match the existing columns of the data in this path ({}) in catalog {}. Please ensure you are producing data of the same type, or move to a new path. Please note, your data was saved with file complete filename: {}, but it was not added to meta_data'.format(path, catalog.filename, path+save_name))
+		catalog.append(meta_data, path)
+		if return_df:
+			return df
+		return
+
 	if existing_meta_data is not None:
 		if set(meta_data.columns) != set(existing_meta_data.columns):
 			raise ValueError('the columns of meta_data do not match the existing columns of the data in this path ({}). Please ensure you are producing data of the same type, or move to a new path. Please note, your data was saved with file complete filename: {}, but it was not added to meta_data'.format(path, path+save_name))
@@ -500,6 +530,29 @@ def trial(run_function, run_function_args, path, return_df=False, save_meta_data
 		return df
 
 
+def _trial_catalog(path, catalog):
+	"""Return the catalog trial appends to (MetaDataCatalog) or None. Without catalog, the catalog of path is used if it exists (``load_Dataset`` only reads the catalog of a path which has one). A meta_data.csv in path is migrated to a catalog without rows of path."""
+	if (catalog is False or catalog is None) and os.path.isfile(os.path.join(path, CATALOG_FILENAME)):
+		catalog = True
+	if catalog is False or catalog is None:
+		return None
+	if catalog is True:
+		catalog = os.path.join(path, CATALOG_FILENAME)
+	if not isinstance(catalog, MetaDataCatalog):
+		catalog = MetaDataCatalog(catalog)
+	if len(catalog.columns_of(path)) == 0 and os.path.isfile(os.path.join(path, 'meta_data.csv')):
+		migrate_meta_data(path, catalog)
+	return catalog
+
+def _get_catalog_trial_number(catalog, meta_data, path):
+	"""Trial number of meta_data: one more than the largest trial of the rows of path in catalog with the same meta data."""
+	where = ' AND '.join('"{}" IS ?'.format(str(key).replace('"', '""')) for key in meta_data)
+	existing, paths = catalog.query(where if len(where) != 0 else None, tuple(meta_data[key] for key in meta_data), path = path, columns = ['trial'])
+	trials = existing['trial']
+	if len(trials) == 0:
+		return int(0)
+	return int(max(trials)+1)
+
 def _generate_meta_data_query_str(meta_data):
 	query_str = ''
 	for key in meta_data:
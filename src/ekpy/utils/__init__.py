@@ -1,2 +1,4 @@
 from .core import *
-from .save import *
\ No newline at end of file
+from .save import *
+from .csv_backends import *
+from .catalog import *
\ No newline at end of file
@@ -0,0 +1,243 @@
+import os
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+__all__ = ('CATALOG_FILENAME', 'MetaDataCatalog', 'migrate_meta_data')
+
+# default name of the catalog of a data directory
+CATALOG_FILENAME = 'meta_data.sqlite'
+
+_TABLE = 'meta_data'
+# directory of the data file of each row, relative to the catalog
+_PATH_COLUMN = '_path'
+
+
+def _quote(name):
+	return '"{}"'.format(str(name).replace('"', '""'))
+
+def _declared_type(values):
+	"""SQLite type of column with values (numpy.ndarray). Columns of any other dtype have no type, so values are stored as they are."""
+	kind = values.dtype.kind
+	if kind == 'b':
+		return 'BOOLEAN'
+	if kind in 'iu':
+		return 'INTEGER'
+	if kind == 'f':
+		return 'REAL'
+	return ''
+
+def _to_sql_value(value):
+	"""Convert value to a type sqlite3 can store. nan is stored as NULL, anything but int, float, str and bytes as str (as in a csv)."""
+	if value is None or value is pd.NA or value is pd.NaT:
+		return None
+	if isinstance(value, (bool, np.bool_)):
+		return bool(value)
+	if isinstance(value, (int, np.integer)):
+		return int(value)
+	if isinstance(value, (float, np.floating)):
+		return None if np.isnan(value) else float(value)
+	if isinstance(value, (str, bytes)):
+		return value
+	return str(value)
+
+
+class MetaDataCatalog():
+	"""SQLite catalog of meta data. Holds the rows of meta data of one data directory, or of several directories sharing one catalog, and the directory of each row. Unlike ``meta_data.csv``, rows are appended without rewriting the catalog and filters are evaluated by SQLite, so a Dataset can be loaded from part of a large catalog (see ``ekpy.analysis.load_Dataset`` and ``ekpy.analysis.load_catalog``). Columns are added as rows with new columns are appended.
+
+	args:
+		filename (str): Path to the catalog. Created if it does not exist. The catalog of a data directory is ``os.path.join(path, CATALOG_FILENAME)``.
+
+	examples:
+
+		.. code-block:: python
+
+			>>> from ekpy.utils import MetaDataCatalog, migrate_meta_data
+			>>> catalog = migrate_meta_data(path) # once, from meta_data.csv
+			>>> catalog.append({'high_voltage_v':1, 'trial':0, 'filename':'a.csv'}, path)
+			>>> meta_data, paths = catalog.query('high_voltage_v > ? AND trial = 0', params=(0.5,))
+
+	"""
+
+	def __init__(self, filename):
+		self.filename = os.path.abspath(filename)
+		self.directory = os.path.dirname(self.filename)
+		with self._connect() as con:
+			con.execute('CREATE TABLE IF NOT EXISTS {} ({} TEXT NOT NULL)'.format(_TABLE, _PATH_COLUMN))
+			con.execute('CREATE INDEX IF NOT EXISTS {0}_{1} ON {0} ({1})'.format(_TABLE, _PATH_COLUMN))
+			con.commit()
+
+	def __repr__(self):
+		return 'MetaDataCatalog({!r})'.format(self.filename)
+
+	def __len__(self):
+		with self._connect() as con:
+			return con.execute('SELECT COUNT(*) FROM {}'.format(_TABLE)).fetchone()[0]
+
+	def _connect(self):
+		return closing(sqlite3.connect(self.filename, timeout=60))
+
+	def _table_info(self, con):
+		"""Return [(column, declared type)] of the meta data columns."""
+		return [(row[1], row[2]) for row in con.execute('PRAGMA table_info({})'.format(_TABLE)) if row[1] != _PATH_COLUMN]
+
+	def _relative(self, path):
+		try:
+			return os.path.relpath(os.path.abspath(path), self.directory)
+		except ValueError:
+			# different drive
+			return os.path.abspath(path)
+
+	def _absolute(self, path):
+		return os.path.normpath(os.path.join(self.directory, path))
+
+	@property
+	def columns(self):
+		"""Meta data columns of the catalog."""
+		with self._connect() as con:
+			return [column for column, declared in self._table_info(con)]
+
+	@property
+	def paths(self):
+		"""Directories with rows in the catalog."""
+		with self._connect() as con:
+			rows = con.execute('SELECT DISTINCT {} FROM {}'.format(_PATH_COLUMN, _TABLE)).fetchall()
+		return [self._absolute(row[0]) for row in rows]
+
+	def columns_of(self, path):
+		"""Return the columns which have a value in at least one row of path.
+
+		args:
+			path (str): Directory
+
+		returns:
+			(list): columns
+		"""
+		with self._connect() as con:
+			columns = [column for column, declared in self._table_info(con)]
+			if len(columns) == 0:
+				return []
+			counts = con.execute(
+				'SELECT {} FROM {} WHERE {} = ?'.format(', '.join('COUNT({})'.format(_quote(column)) for column in columns), _TABLE, _PATH_COLUMN),
+				(self._relative(path),)
+			).fetchone()
+		return [column for column, count in zip(columns, counts) if count > 0]
+
+	def append(self, meta_data, path):
+		"""Append rows of meta data of files in path to the catalog.
+
+		args:
+			meta_data (pandas.DataFrame or dict): Rows, or a single row as dict
+			path (str): Directory of the files of the rows
+
+		"""
+		if isinstance(meta_data, dict):
+			meta_data = pd.DataFrame(meta_data, index=[0])
+		if _PATH_COLUMN in meta_data.columns:
+			raise ValueError('{} is reserved by the catalog and cannot be a column of meta_data'.format(_PATH_COLUMN))
+		if not meta_data.columns.is_unique:
+			raise ValueError('meta_data has duplicate columns')
+		if len(meta_data) == 0:
+			return
+
+		columns = [str(column) for column in meta_data.columns]
+		values = [[_to_sql_value(value) for value in meta_data[column].to_numpy(dtype=object)] for column in meta_data.columns]
+		path = self._relative(path)
+		with self._connect() as con:
+			existing = {column for column, declared in self._table_info(con)}
+			for column, key in zip(columns, meta_data.columns):
+				if column not in existing:
+					con.execute('ALTER TABLE {} ADD COLUMN {} {}'.format(_TABLE, _quote(column), _declared_type(meta_data[key].values)))
+			con.executemany(
+				'INSERT INTO {} ({}, {}) VALUES (?, {})'.format(_TABLE, _PATH_COLUMN, ', '.join(_quote(column) for column in columns), ', '.join('?'*len(columns))),
+				([path] + list(row) for row in zip(*values))
+			)
+			con.commit()
+
+	def query(self, where=None, params=(), path=None, columns=None):
+		"""Return the rows of meta data satisfying where, in the order they were appended.
+
+		args:
+			where (str or None): SQL expression (the WHERE clause, without WHERE) on the columns of the catalog, *e.g.* ``'high_voltage_v > 0.5 AND trial = 0'``. Use placeholders (? or :name) for values. None returns all rows.
+			params (tuple or dict): Values of the placeholders in where
+			path (str or None): Only return rows of directory path. None returns rows of every directory.
+			columns (array-like or None): Columns to return. None returns all columns.
+
+		returns:
+			(pandas.DataFrame, numpy.ndarray): meta data, directory of each row
+
+		"""
+		conditions = [] if where is None else ['({})'.format(where)]
+		if isinstance(params, dict):
+			params = {key:_to_sql_value(params[key]) for key in params}
+		else:
+			params = tuple(_to_sql_value(value) for value in params)
+		if path is not None:
+			if isinstance(params, dict):
+				params['_ekpy_path'] = self._relative(path)
+				conditions.append('{} = :_ekpy_path'.format(_PATH_COLUMN))
+			else:
+				params = params + (self._relative(path),)
+				conditions.append('{} = ?'.format(_PATH_COLUMN))
+
+		with self._connect() as con:
+			info = self._table_info(con)
+			if columns is not None:
+				declared = dict(info)
+				missing = [column for column in columns if column not in declared]
+				if len(missing) != 0:
+					raise KeyError('columns {} not in catalog. Available columns are {}'.format(missing, list(declared)))
+				info = [(column, declared[column]) for column in columns]
+			sql = 'SELECT {} FROM {}'.format(', '.join([_PATH_COLUMN] + [_quote(column) for column, declared in info]), _TABLE)
+			if len(conditions) != 0:
+				sql += ' WHERE ' + ' AND '.join(conditions)
+			sql += ' ORDER BY rowid'
+			out = pd.read_sql_query(sql, con, params=params)
+
+		paths = out.pop(_PATH_COLUMN).to_numpy(dtype=object)
+		absolute = {x:self._absolute(x) for x in pd.unique(paths)}
+		paths = np.array([absolute[x] for x in paths], dtype=object)
+
+		for column, declared in info:
+			if declared == 'BOOLEAN' and out[column].notna().all():
+				out[column] = out[column].astype(bool)
+		return out, paths
+
+
+def migrate_meta_data(path, catalog=None, overwrite=False):
+	"""Copy the meta data of path (``meta_data.csv``, or the legacy pickle ``meta_data``) to a catalog. Once migrated, ``ekpy.analysis.load_Dataset`` reads the catalog of path instead of ``meta_data.csv`` and ``ekpy.control.trial(..., catalog=True)`` appends to it.
+
+	args:
+		path (str): Data directory
+		catalog (str, MetaDataCatalog or None): Catalog to copy to. None for the catalog of path (``os.path.join(path, CATALOG_FILENAME)``).
+		overwrite (bool): Replace rows of path already in the catalog. If False and the catalog has rows of path, raise ValueError.
+
+	returns:
+		(MetaDataCatalog): catalog
+
+	"""
+	if catalog is None:
+		catalog = os.path.join(path, CATALOG_FILENAME)
+	if not isinstance(catalog, MetaDataCatalog):
+		catalog = MetaDataCatalog(catalog)
+
+	try:
+		meta_data = pd.read_csv(os.path.join(path, 'meta_data.csv'))
+	except FileNotFoundError:
+		try:
+			meta_data = pd.read_pickle(os.path.join(path, 'meta_data'))
+		except FileNotFoundError:
+			raise FileNotFoundError('No file named "meta_data.csv" (or legacy pickle file "meta_data") exists in path "{}"'.format(path))
+
+	with catalog._connect() as con:
+		relative = catalog._relative(path)
+		if con.execute('SELECT 1 FROM {} WHERE {} = ? LIMIT 1'.format(_TABLE, _PATH_COLUMN), (relative,)).fetchone() is not None:
+			if not overwrite:
+				raise ValueError('catalog {} already has rows of path {}. Use overwrite=True to replace them.'.format(catalog.filename, path))
+			con.execute('DELETE FROM {} WHERE {} = ?'.format(_TABLE, _PATH_COLUMN), (relative,))
+			con.commit()
+
+	catalog.append(meta_data, path)
+	return catalog
@@ -0,0 +1,150 @@
+import csv
+import importlib.util
+import warnings
+
+import numpy as np
+import pandas as pd
+
+__all__ = ('register_csv_backend', 'set_csv_backend', 'get_csv_backend', 'available_csv_backends')
+
+# name -> (parse, module required by parse or None)
+_backends = {}
+_default_backend = 'pandas'
+
+
+def register_csv_backend(name:str, parse, requires:'str or None'=None):
+	"""Register a backend to parse the csv data of ekpy data files (see ``ekpy.utils.read_ekpy_data``). The ekpy heading is handled by ``read_ekpy_data``, so every backend sees the same input.
+
+	args:
+		name (str): Name of the backend
+		parse (function): f -> pandas.DataFrame. Called as ``parse(f, usecols=None, dtype=None)`` where f is the file opened in binary mode, positioned at the row of column names. usecols and dtype have the meaning of ``pandas.read_csv``.
+		requires (str or None): Module the backend needs. The backend is only available if the module can be imported.
+
+	"""
+	_backends[name] = (parse, requires)
+
+def available_csv_backends():
+	"""Return the names of the registered csv backends whose requirements are installed.
+
+	returns:
+		(list): names
+	"""
+	return [name for name in _backends if _is_available(name)]
+
+def set_csv_backend(name:str):
+	"""Set the csv backend used by ``read_ekpy_data`` when no backend is given. Default is 'pandas'. To use a backend for a single Dataset instead, pass ``functools.partial(read_ekpy_data, backend=name)`` as readfileby.
+
+	Note that worker processes started with 'spawn' (e.g. ``get_data(parallel='process')`` on Windows or macOS) do not see this setting, use the partial instead.
+
+	args:
+		name (str): Name of the backend, see ``available_csv_backends``
+
+	examples:
+
+		.. code-block:: python
+
+			>>> from ekpy.utils import set_csv_backend, available_csv_backends
+			>>> available_csv_backends()
+			['pandas', 'numpy', 'pyarrow']
+			>>> set_csv_backend('pyarrow')
+
+	"""
+	_check_backend(name)
+	if not _is_available(name):
+		raise ImportError('csv backend {} requires {}, which is not installed'.format(name, _backends[name][1]))
+	global _default_backend
+	_default_backend = name
+
+def get_csv_backend():
+	"""Return the name of the csv backend used by ``read_ekpy_data`` when no backend is given.
+
+	returns:
+		(str): name
+	"""
+	return _default_backend
+
+def _check_backend(name):
+	if name not in _backends:
+		raise ValueError('unknown csv backend {}. Registered backends are {}'.format(name, list(_backends)))
+
+def _is_available(name):
+	requires = _backends[name][1]
+	return requires is None or importlib.util.find_spec(requires) is not None
+
+def _get_parser(name=None):
+	"""Return the parse function of backend name (None for the default backend). Falls back to pandas if the requirements of the backend are not installed."""
+	if name is None:
+		name = _default_backend
+	_check_backend(name)
+	if not _is_available(name):
+		warnings.warn('csv backend {} requires {}, which is not installed. Falling back to pandas.'.format(name, _backends[name][1]))
+		name = 'pandas'
+	return _backends[name][0]
+
+def _read_column_names(f):
+	"""Return the column names of the csv data in f (binary, positioned at the row of column names) without moving f."""
+	position = f.tell()
+	line = f.readline()
+	while line.strip() == b'' and line != b'':
+		line = f.readline()
+	f.seek(position)
+	return next(csv.reader([line.decode('utf-8').rstrip('\r\n')]), [])
+
+def _column_dtype(dtype, column):
+	return dtype.get(column) if isinstance(dtype, dict) else dtype
+
+
+def _parse_pandas(f, usecols=None, dtype=None):
+	"""Parse with the ``pandas.read_csv`` C engine."""
+	return pd.read_csv(f, skip_blank_lines=True, usecols=usecols, dtype=dtype)
+
+def _parse_numpy(f, usecols=None, dtype=None):
+	"""Parse with ``numpy.loadtxt``. For purely numeric data only: every column is float64 unless dtype is given. Data that numpy cannot parse (e.g. strings or missing values) is parsed with pandas instead."""
+	from .save import _select_usecols
+
+	position = f.tell()
+	names = _read_column_names(f)
+	columns = names if usecols is None else _select_usecols(names, usecols)
+	positions = [names.index(column) for column in columns]
+	try:
+		f.readline()
+		values = np.loadtxt(f, delimiter=',', usecols=positions, ndmin=2, dtype=np.float64 if dtype is None or isinstance(dtype, dict) else dtype)
+	except ValueError:
+		f.seek(position)
+		return _parse_pandas(f, usecols=usecols, dtype=dtype)
+
+	data = pd.DataFrame(values, columns=columns)
+	if isinstance(dtype, dict):
+		data = data.astype({column:dtype[column] for column in dtype if column in data.columns})
+	return data
+
+def _parse_pyarrow(f, usecols=None, dtype=None):
+	"""Parse with the (multithreaded) ``pyarrow.csv`` reader."""
+	import pyarrow
+	from pyarrow import csv as pyarrow_csv
+	from .save import _select_usecols
+
+	names = _read_column_names(f)
+	columns = None if usecols is None else _select_usecols(names, usecols)
+
+	column_types, after = {}, {}
+	if dtype is not None:
+		for column in (names if columns is None else columns):
+			column_dtype = _column_dtype(dtype, column)
+			if column_dtype is None:
+				continue
+			try:
+				column_types[column] = pyarrow.from_numpy_dtype(np.dtype(column_dtype))
+			except (TypeError, pyarrow.ArrowNotImplementedError):
+				# e.g. 'category', converted by pandas
+				after[column] = column_dtype
+
+	table = pyarrow_csv.read_csv(f, convert_options=pyarrow_csv.ConvertOptions(include_columns=columns, column_types=column_types))
+	data = table.to_pandas()
+	if len(after) > 0:
+		data = data.astype(after)
+	return data
+
+register_csv_backend('pandas', _parse_pandas)
+register_csv_backend('numpy', _parse_numpy)
+register_csv_backend('pyarrow', _parse_pyarrow, requires='pyarrow')
@@ -1,37 +1,100 @@
 import os
+import struct
+import numpy as np
 import pandas as pd
 
-__all__ = ('write_ekpy_data', 'read_ekpy_data')
+from .csv_backends import _get_parser
 
+__all__ = ('write_ekpy_data', 'read_ekpy_data', 'BINARY_EXTENSION')
 
-def write_ekpy_data(fname:str, data:'pandas.DataFrame', meta_data:dict):
+
+# binary ekpy files. layout (all little-endian):
+#	prefix: magic, version, reserved, heading nbytes, column table nbytes
+#	heading: the same 'key:::value' heading as text ekpy files (utf-8)
+#	column table: ncols, nrows, then for each column (name nbytes, dtype nbytes, data offset), name, dtype.str
+#	data: each column contiguous, starting at a multiple of _BINARY_ALIGN from the start of the file
+BINARY_EXTENSION = '.ekb'
+_BINARY_MAGIC = b'\x93EKPYBIN'
+_BINARY_VERSION = 1
+_BINARY_ALIGN = 64
+_BINARY_PREFIX = struct.Struct('<8sHHII')
+_BINARY_TABLE = struct.Struct('<IQ')
+_BINARY_COLUMN = struct.Struct('<HHQ')
+
+def write_ekpy_data(fname:str, data:'pandas.DataFrame', meta_data:dict, binary=False):
 	"""Write and ekpy data file. This will have the meta data as a header at the top.
 
 	args:
 		fname (str): File name
 		data (pandas.DataFrame): Data
 		meta_data (dict): Meta data
+		binary (bool): Write the binary ekpy format instead of csv. The data is stored as raw (little-endian) arrays which ``read_ekpy_data`` reads in a single read (or memory maps), this is much faster to read and smaller than csv. All columns must have a numeric (non-object) dtype. By convention binary files use the extension ``BINARY_EXTENSION`` ('.ekb').
 
 	"""
-	header = 'ekpy_heading{}'.format(os.linesep)
-	for key in meta_data:
-		header+='{}:::{}{}'.format(key, meta_data[key], os.linesep)
-	header+='ekpy_heading_complete{}'.format(os.linesep)    
+	if binary:
+		return _write_ekpy_binary(fname, data, meta_data)
 
-	data_to_write=data.to_csv(index=False)
-	to_write=(header+data_to_write).replace('\r\n', '\n')
+	to_write=(_ekpy_heading(meta_data, os.linesep)+data.to_csv(index=False)).replace('\r\n', '\n')
 	with open(fname, 'w', newline=os.linesep) as f:
 		f.write(to_write)
 	return
 
-def read_ekpy_data(file:str, skiprows:'int or None'=None, return_meta_data=False, return_skiprows=False):
+def _ekpy_heading(meta_data, linesep):
+	heading = 'ekpy_heading{}'.format(linesep)
+	for key in meta_data:
+		heading+='{}:::{}{}'.format(key, meta_data[key], linesep)
+	heading+='ekpy_heading_complete{}'.format(linesep)
+	return heading
+
+def _write_ekpy_binary(fname, data, meta_data):
+	"""Write binary ekpy data file. See ``write_ekpy_data``."""
+	if not data.columns.is_unique:
+		raise ValueError('binary ekpy files require unique column names')
+	columns = []
+	for column in data.columns:
+		values = np.asarray(data[column])
+		if values.dtype.hasobject or values.ndim != 1:
+			raise TypeError('column {} has dtype {}, which cannot be written to a binary ekpy file. Only numeric (non-object) columns are supported, use binary=False'.format(column, values.dtype))
+		columns.append((str(column).encode('utf-8'), np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))))
+
+	heading = _ekpy_heading(meta_data, '\n').encode('utf-8')
+	table_nbytes = _BINARY_TABLE.size + sum(
+		_BINARY_COLUMN.size + len(name) + len(values.dtype.str) for name, values in columns
+	)
+
+	offset = _BINARY_PREFIX.size + len(heading) + table_nbytes
+	table = [_BINARY_TABLE.pack(len(columns), len(data))]
+	offsets = []
+	for name, values in columns:
+		offset = -(-offset//_BINARY_ALIGN)*_BINARY_ALIGN
+		offsets.append(offset)
+		dtype = values.dtype.str.encode('ascii')
+		table.append(_BINARY_COLUMN.pack(len(name), len(dtype), offset) + name + dtype)
+		offset += values.nbytes
+
+	with open(fname, 'wb') as f:
+		f.write(_BINARY_PREFIX.pack(_BINARY_MAGIC, _BINARY_VERSION, 0, len(heading), table_nbytes))
+		f.write(heading)
+		f.write(b''.join(table))
+		for (name, values), offset in zip(columns, offsets):
+			f.write(b'\x00'*(offset - f.tell()))
+			f.write(values.tobytes())
+	return
+
+def read_ekpy_data(file:str, skiprows:'int or None'=None, return_meta_data=False, return_skiprows=False, mmap_mode=None, usecols=None, dtype=None, backend=None):
 	"""Read ekpy data file. If no ekpy heading exists ('ekpy_heading') defaults to `pandas.read_csv'
 
+	Binary ekpy files (see ``write_ekpy_data``) are recognized by their first bytes, regardless of extension. They are read in a single read (or memory mapped with mmap_mode, no copy), skiprows is ignored and the returned n_skiprows is None.
+
 	args:
 		file (str): File name
 		skiprows (int or None): Number of rows to skip (use this when you wish to skip parsing header/meta data). Default behavior (None) will parse meta_data. If int provided, no meta data will be returned
 		return_meta_data (bool): Whether to return the associated meta data (heading) or just return the data
 		return_skiprows (bool): Whether to return the number of rows to skip when reading data (i.e., number of rows of meta data)
+		mmap_mode (str or None): Binary files only. None (default) reads the data into memory and closes the file. 'r' memory maps the data read-only, 'c' copy-on-write (the data may be modified, changes are not written to file). A memory mapped file stays open until its data is garbage collected, so only map files whose data you keep.
+		usecols (list-like, callable or None): Only return these columns (names or positions), as in ``pandas.read_csv``. The columns keep the order of the file. None returns all columns.
+		dtype (type name, dict of column -> type or None): dtype of the returned data (e.g. 'float32'), as in ``pandas.read_csv``. None infers the dtype (csv) or uses the stored dtype (binary).
+		backend (str or None): csv backend which parses the data, see ``ekpy.utils.available_csv_backends``. 'pandas' (``pandas.read_csv``), 'numpy' (``numpy.loadtxt``, numeric data only, all columns float64 unless dtype is given) or 'pyarrow' (multithreaded, requires pyarrow). None uses the default backend, see ``ekpy.utils.set_csv_backend``.
 
 	returns:
 		(pandas.DataFrame) : Data
@@ -39,40 +102,111 @@ def read_ekpy_data(file:str, skiprows:'int or None'=None, return_meta_data=False
 		(pandas.DataFrame, [Optional] int): (Data, n_skiprows)
 		(pandas.DataFrame, [Optional] dict, [Optional] int): (Data, meta_data, n_skiprows)
 	"""
-	if skiprows is not None:
-		return pd.read_csv(file, skip_blank_lines=True, skiprows=skiprows)
-
-	# if skiprows is None:
-	with open(file, 'r') as f:
-		lines = f.readlines()
-	index=len(lines)+1
-	for i, line in enumerate(lines):
+	if skiprows is not None and not isinstance(file, (str, os.PathLike)):
+		# buffers can be read directly when the heading is skipped
+		return pd.read_csv(file, skip_blank_lines=True, skiprows=skiprows, usecols=usecols, dtype=dtype)
+
+	with open(file, 'rb') as raw:
+		if raw.peek(len(_BINARY_MAGIC))[:len(_BINARY_MAGIC)] == _BINARY_MAGIC:
+			data, meta_data = _read_ekpy_binary(raw, mmap_mode=mmap_mode, usecols=usecols, dtype=dtype)
+			out = (data,) + ((meta_data,) if return_meta_data else ()) + ((None,) if return_skiprows else ())
+			return out if len(out) > 1 else data
+
+		# the heading and the data are read from the same handle
+		parse = _get_parser(backend)
+		if skiprows is not None:
+			for i in range(skiprows):
+				raw.readline()
+			return parse(raw, usecols=usecols, dtype=dtype)
+
+		lines = _scan_ekpy_heading(raw)
+		if lines is None:
+			if return_meta_data:
+				raise ValueError('Failed to find end of ekpy heading. Considering trying again with return_meta_data set to False?')
+			raw.seek(0)
+			data = parse(raw, usecols=usecols, dtype=dtype)
+			return (data, 0) if return_skiprows else data # skip no rows
+
+		data = parse(raw, usecols=usecols, dtype=dtype)
+
+	out = (data,) + ((_parse_ekpy_meta_data(lines),) if return_meta_data else ()) + ((len(lines),) if return_skiprows else ())
+	return out if len(out) > 1 else data
+
+def _scan_ekpy_heading(f):
+	"""Read the ekpy heading of the open (binary) file f line by line, stopping after the end of the heading so the data can be parsed from the same handle.
+
+	returns:
+		(list or None): The (decoded) lines of the heading (including 'ekpy_heading' and 'ekpy_heading_complete'). None if f does not start with a complete ekpy heading.
+	"""
+	lines = []
+	for i, line in enumerate(iter(f.readline, b'')):
+		line = line.decode('utf-8')
 		if i == 0 and 'ekpy_heading' not in line:
-			break
-		if 'ekpy_heading_complete' not in line:
-			continue
-		else:
-			index=i
-
-	if index>len(lines):
-		if return_meta_data:
-			raise ValueError('Failed to find end of ekpy heading. Considering trying again with return_meta_data set to False?')
-		else:
-			if return_skiprows:
-				return pd.read_csv(file), 0 # skip no rows
-			else:
-				return pd.read_csv(file)
-		
-	if not return_meta_data:
-		if return_skiprows:
-			return pd.read_csv(file, skip_blank_lines=True, skiprows=index+1), index+1
-		else:
-			return pd.read_csv(file, skip_blank_lines=True, skiprows=index+1)
+			return None
+		lines.append(line)
+		if 'ekpy_heading_complete' in line:
+			return lines
+	return None
+
+def _read_ekpy_binary(file, mmap_mode=None, usecols=None, dtype=None):
+	"""Read binary ekpy data file (file name or file opened in binary mode). See ``read_ekpy_data``.
+
+	returns:
+		(pandas.DataFrame, dict): (Data, meta_data)
+	"""
+	if mmap_mode is None:
+		buffer = np.fromfile(file, dtype=np.uint8)
 	else:
-		if return_skiprows:
-			return pd.read_csv(file, skip_blank_lines=True, skiprows=index+1), _parse_ekpy_meta_data(lines), index+1
-		else:
-			return pd.read_csv(file, skip_blank_lines=True, skiprows=index+1), _parse_ekpy_meta_data(lines)
+		# a single map for the whole file, columns are views into it
+		buffer = np.memmap(file, dtype=np.uint8, mode=mmap_mode)
+
+	magic, version, _, heading_nbytes, table_nbytes = _BINARY_PREFIX.unpack_from(buffer, 0)
+	if version > _BINARY_VERSION:
+		raise ValueError('{} is binary ekpy version {}, this version of ekpy reads up to version {}. Please upgrade ekpy.'.format(file, version, _BINARY_VERSION))
+
+	position = _BINARY_PREFIX.size
+	heading = bytes(buffer[position:position+heading_nbytes]).decode('utf-8')
+	position += heading_nbytes
+
+	ncols, nrows = _BINARY_TABLE.unpack_from(buffer, position)
+	position += _BINARY_TABLE.size
+	table = {}
+	for i in range(ncols):
+		name_nbytes, dtype_nbytes, offset = _BINARY_COLUMN.unpack_from(buffer, position)
+		position += _BINARY_COLUMN.size
+		name = bytes(buffer[position:position+name_nbytes]).decode('utf-8')
+		position += name_nbytes
+		stored_dtype = np.dtype(bytes(buffer[position:position+dtype_nbytes]).decode('ascii'))
+		position += dtype_nbytes
+		table[name] = (stored_dtype, offset)
+
+	data = {}
+	for name in (table if usecols is None else _select_usecols(list(table), usecols)):
+		stored_dtype, offset = table[name]
+		values = buffer[offset:offset+nrows*stored_dtype.itemsize].view(stored_dtype)
+		column_dtype = dtype.get(name) if isinstance(dtype, dict) else dtype
+		data[name] = values if column_dtype is None else values.astype(column_dtype, copy=False)
+
+	return pd.DataFrame(data, index=pd.RangeIndex(nrows), copy=False), _parse_ekpy_meta_data(heading.splitlines(keepends=True))
+
+def _select_usecols(columns, usecols):
+	"""Return the columns selected by usecols (names, positions or callable, as in ``pandas.read_csv``) in the order of columns."""
+	if callable(usecols):
+		return [column for column in columns if usecols(column)]
+
+	usecols = list(usecols)
+	if all(isinstance(column, (int, np.integer)) and not isinstance(column, bool) for column in usecols) and len(usecols) > 0:
+		missing = [column for column in usecols if not -len(columns) <= column < len(columns)]
+		if len(missing) > 0:
+			raise ValueError('Usecols do not match columns, positions out of range: {}'.format(missing))
+		positions = set(column % len(columns) for column in usecols)
+		return [column for i, column in enumerate(columns) if i in positions]
+
+	missing = [column for column in usecols if column not in set(columns)]
+	if len(missing) > 0:
+		raise ValueError('Usecols do not match columns, columns expected but not found: {}'.format(missing))
+	usecols = set(usecols)
+	return [column for column in columns if column in usecols]
 
 def _parse_ekpy_meta_data(lines:list):
 	"""Parse ekpy_heading."""